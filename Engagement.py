@@ -1,182 +1,313 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import ast
-from collections import Counter
-from fpdf import FPDF
-import plotly.io as pio
-import kaleido
-import tempfile
-import os
-
-# Charger les données
-app_opened_time = pd.read_csv('appOpenedTime.csv')
-sessions_with_pages_true = pd.read_csv('sessions_with_pages_true.csv')
-users = pd.read_csv('users.csv')
-button_pressed_time = pd.read_csv('buttonPressedTime.csv')
-
-# Convertir les colonnes de date en datetime
-app_opened_time['time'] = pd.to_datetime(app_opened_time['time'])
-sessions_with_pages_true['session_start'] = pd.to_datetime(sessions_with_pages_true['session_start'])
-sessions_with_pages_true['session_end'] = pd.to_datetime(sessions_with_pages_true['session_end'])
-
-# Widgets interactifs pour le filtrage
-selected_country = st.sidebar.multiselect("Sélectionnez les pays", options=users['country'].unique(), key='country_selector')
-selected_device_type = st.sidebar.multiselect("Sélectionnez le type d'appareil", options=['Android', 'IOS'], key='device_type_selector')
-date_range = st.sidebar.date_input("Sélectionnez la plage de dates", [])
-
-# Filtrage des données selon les sélections
-filtered_users = users.copy()
-if selected_country:
-    filtered_users = filtered_users[filtered_users['country'].isin(selected_country)]
-if selected_device_type:
-    device_mapping = {'Android': True, 'IOS': False}
-    filtered_users = filtered_users[filtered_users['isAndroid'].apply(lambda x: 'Android' if x else 'IOS').isin(selected_device_type)]
-
-# Vérifier si une plage de dates complète est sélectionnée
-if len(date_range) == 2:
-    start_date, end_date = date_range[0], date_range[1]
-    filtered_sessions = sessions_with_pages_true[
-        (sessions_with_pages_true['session_start'] >= pd.Timestamp(start_date)) &
-        (sessions_with_pages_true['session_end'] <= pd.Timestamp(end_date)) &
-        (sessions_with_pages_true['uid'].isin(filtered_users['uid']))
-    ]
-else:
-    # st.warning("Veuillez sélectionner une plage de deux dates.")
-    filtered_sessions = sessions_with_pages_true[sessions_with_pages_true['uid'].isin(filtered_users['uid'])]
 
+from approx import APPROX_ROW_THRESHOLD, domain_rows, estimate_totals, population_size, select_strata
+from data_loader import date_bounds, filter_users, load_button_pressed_time, load_dataset, load_forecast_histories, load_forecasts, load_samples, load_sessions, sidebar_filtres
+from report import create_pdf
 
-# Convertir les durées des sessions en minutes
-filtered_sessions['session_duration_in_minutes'] = filtered_sessions['session_duration_in_seconds'] / 60
-
-# Analyser les données avec les filtres appliqués
-sessions_filtered = filtered_sessions.copy()
-average_session_duration_minutes_filtered = sessions_filtered['session_duration_in_minutes'].mean()
-sessions_per_user_filtered = sessions_filtered.groupby('uid').size()
-average_sessions_per_user_filtered = sessions_per_user_filtered.mean()
-users_daily_filtered = sessions_per_user_filtered[sessions_per_user_filtered == 1].count()
-users_weekly_filtered = sessions_per_user_filtered[(sessions_per_user_filtered > 1) & (sessions_per_user_filtered <= 7)].count()
-users_monthly_filtered = sessions_per_user_filtered[sessions_per_user_filtered > 7].count()
-dau_filtered = sessions_filtered['session_start'].dt.date.value_counts().mean()
-wau_filtered = sessions_filtered['session_start'].dt.to_period('W').value_counts().mean()
-mau_filtered = sessions_filtered['session_start'].dt.to_period('M').value_counts().mean()
-total_signups_filtered = len(filtered_users)
-total_purchases_filtered = len(sessions_filtered)  # Remplacer par le nombre d'achats si disponible
-conversion_rate_filtered = (total_purchases_filtered / total_signups_filtered) * 100 if total_signups_filtered > 0 else 0
-
-# Graphiques avec filtres appliqués
-fig_engagement_distribution_filtered = px.pie(pd.DataFrame({
-    'Fréquence': ['Quotidienne', 'Hebdomadaire', 'Mensuelle'],
-    'Utilisateurs': [users_daily_filtered, users_weekly_filtered, users_monthly_filtered]
-}), names='Fréquence', values='Utilisateurs', title='Répartition des Utilisateurs par Fréquence d\'Utilisation (Filtrée)')
-
-# Mise à jour du graphique : DAU, WAU, MAU comme des lignes séparées avec filtres
-fig_active_users_filtered = go.Figure()
-
-# DAU - Utilisateurs Actifs Quotidiens
-valeurs_dau_filtered = sessions_filtered.groupby(sessions_filtered['session_start'].dt.date).size()
-fig_active_users_filtered.add_trace(go.Scatter(x=valeurs_dau_filtered.index, y=valeurs_dau_filtered, mode='lines', name='DAU', line=dict(color='blue')))
-
-# WAU - Utilisateurs Actifs Hebdomadaires
-valeurs_wau_filtered = sessions_filtered.groupby(sessions_filtered['session_start'].dt.to_period('W').apply(lambda r: r.start_time)).size()
-fig_active_users_filtered.add_trace(go.Scatter(x=valeurs_wau_filtered.index, y=valeurs_wau_filtered, mode='lines', name='WAU', line=dict(color='green')))
-
-# MAU - Utilisateurs Actifs Mensuels
-valeurs_mau_filtered = sessions_filtered.groupby(sessions_filtered['session_start'].dt.to_period('M').apply(lambda r: r.start_time)).size()
-fig_active_users_filtered.add_trace(go.Scatter(x=valeurs_mau_filtered.index, y=valeurs_mau_filtered, mode='lines', name='MAU', line=dict(color='red')))
-
-fig_active_users_filtered.update_layout(
-    title='Utilisateurs Actifs (DAU, WAU, MAU) (Filtrés)',
-    xaxis_title='Date',
-    yaxis_title='Nombre d\'Utilisateurs',
-    legend_title_text='Métriques',
-    height=400
-)
-
-# Mise à jour du graphique : Engagement des Utilisateurs avec courbes distinctes avec filtres
-fig_engagement_users_filtered = go.Figure()
-
-# Utilisateurs Mensuels
-valeurs_mensuels_filtered = sessions_filtered.groupby(sessions_filtered['session_start'].dt.to_period('M').apply(lambda r: r.start_time)).size()
-fig_engagement_users_filtered.add_trace(go.Scatter(x=valeurs_mensuels_filtered.index, y=valeurs_mensuels_filtered, mode='lines', name='Utilisateurs Mensuels', line=dict(color='red')))
-
-# Utilisateurs Hebdomadaires
-valeurs_hebdomadaires_filtered = sessions_filtered.groupby(sessions_filtered['session_start'].dt.to_period('W').apply(lambda r: r.start_time)).size()
-fig_engagement_users_filtered.add_trace(go.Scatter(x=valeurs_hebdomadaires_filtered.index, y=valeurs_hebdomadaires_filtered, mode='lines', name='Utilisateurs Hebdomadaires', line=dict(color='green')))
-
-# Utilisateurs Quotidiens
-valeurs_quotidiens_filtered = sessions_filtered.groupby(sessions_filtered['session_start'].dt.date).size()
-fig_engagement_users_filtered.add_trace(go.Scatter(x=valeurs_quotidiens_filtered.index, y=valeurs_quotidiens_filtered, mode='lines', name='Utilisateurs Quotidiens', line=dict(color='blue')))
-
-# Sessions Moyennes par Utilisateur
-fig_engagement_users_filtered.add_trace(go.Scatter(x=valeurs_quotidiens_filtered.index, y=[average_sessions_per_user_filtered] * len(valeurs_quotidiens_filtered.index), mode='lines', name='Sessions Moyennes par Utilisateur', line=dict(color='purple')))
-
-fig_engagement_users_filtered.update_layout(
-    title='Engagement des Utilisateurs (Filtré)',
-    xaxis_title='Date',
-    yaxis_title='Nombre d\'Utilisateurs / Sessions',
-    legend_title_text='Métriques',
-    height=400
-)
+# Chaque section est un fragment Streamlit : une interaction à l'intérieur d'une section ne
+# réexécute que cette section. Les calculs sont mis en cache et ne dépendent que des filtres
+# passés en argument, de sorte qu'une section n'est recalculée que si ses entrées changent.
 
-# Interface utilisateur Streamlit
-st.title('Métriques de l\'Application')
 
-# Onglets pour les métriques
-tab1, tab2, tab3, tab4 = st.tabs(["Taux de Conversion", "Utilisateurs Actifs", "Engagement des Utilisateurs", "Durée des Sessions"])
-
-with tab1:
-    st.metric(label="Taux de Conversion", value=f"{conversion_rate_filtered:.2f}%")
-
-with tab2:
-    st.metric(label="Quotidien (DAU)", value=f"{dau_filtered:.2f}")
-    st.metric(label="Hebdomadaire (WAU)", value=f"{wau_filtered:.2f}")
-    st.metric(label="Mensuel (MAU)", value=f"{mau_filtered:.2f}")
-    st.plotly_chart(fig_active_users_filtered, use_container_width=True)
-
-with tab3:
-    st.metric(label="Utilisateurs Quotidiens", value=f"{users_daily_filtered:.2f}")
-    st.metric(label="Utilisateurs Hebdomadaires", value=f"{users_weekly_filtered:.2f}")
-    st.metric(label="Utilisateurs Mensuels", value=f"{users_monthly_filtered:.2f}")
-    st.metric(label="Sessions Moyennes par Utilisateur", value=f"{average_sessions_per_user_filtered:.2f}")
-    st.plotly_chart(fig_engagement_users_filtered, use_container_width=True)
-
-with tab4:
-    st.metric(label="Durée Moyenne des Sessions (minutes)", value=f"{average_session_duration_minutes_filtered:.2f}")
-
-# Répartition des Utilisateurs par Fréquence d'Utilisation
-st.subheader('Répartition des Utilisateurs par Fréquence d\'Utilisation (Filtrée)')
-st.plotly_chart(fig_engagement_distribution_filtered, use_container_width=True)
-
-# Pages et fonctionnalités les plus utilisées
-st.subheader('Pages et Fonctionnalités les Plus Utilisées')
-visited_pages = filtered_sessions['visited_pages'].apply(lambda x: ast.literal_eval(x))
-all_visited_pages = [page for sublist in visited_pages for page in sublist]
-page_counts = Counter(all_visited_pages)
-most_common_pages = page_counts.most_common()
-pages_df = pd.DataFrame(most_common_pages, columns=['Page', 'Visites'])
-fig_most_common_pages = px.bar(pages_df, x='Visites', y='Page', orientation='h', title='Pages les Plus Visitées')
-st.plotly_chart(fig_most_common_pages, use_container_width=True)
-
-# Boutons les plus cliqués
-button_pressed_time['time'] = pd.to_datetime(button_pressed_time['time'])
-filtered_buttons = button_pressed_time[button_pressed_time['uid'].isin(filtered_users['uid'])]
-if date_range:
-    filtered_buttons = filtered_buttons[(filtered_buttons['time'] >= pd.Timestamp(start_date)) & (filtered_buttons['time'] <= pd.Timestamp(end_date))]
-button_counts = filtered_buttons['button'].value_counts()
-button_counts_df = pd.DataFrame(button_counts).reset_index()
-button_counts_df.columns = ['Button', 'Presses']
-fig_most_common_buttons = px.bar(button_counts_df, x='Presses', y='Button', orientation='h', title='Boutons les Plus Cliqués')
-st.plotly_chart(fig_most_common_buttons, use_container_width=True)
-
-# Distribution des durées des sessions (histogramme)
-st.subheader('Distribution des Durées des Sessions (minutes)')
-fig_session_duration = px.histogram(filtered_sessions, x='session_duration_in_minutes', title='Distribution des Durées des Sessions (minutes)', labels={'session_duration_in_minutes': 'Durée des Sessions (minutes)'})
-st.plotly_chart(fig_session_duration, use_container_width=True)
+# Calculs mis en cache (dépendances : pays, appareils, dates)
+@st.cache_data
+def compute_filtered_sessions(countries, devices, dates):
+    sessions_with_pages_true = load_sessions()
+    filtered_users = filter_users(countries, devices)
+    filtered_sessions = sessions_with_pages_true[sessions_with_pages_true['uid'].isin(filtered_users['uid'])]
+    if date_bounds(dates):
+        start_date, end_date = date_bounds(dates)
+        filtered_sessions = filtered_sessions[
+            (filtered_sessions['session_start'] >= start_date) &
+            (filtered_sessions['session_end'] <= end_date)
+        ]
+    # Convertir les durées des sessions en minutes
+    filtered_sessions = filtered_sessions.assign(
+        session_duration_in_minutes=filtered_sessions['session_duration_in_seconds'] / 60)
+    return filtered_sessions
+
+
+@st.cache_data
+def compute_metrics(countries, devices, dates):
+    sessions_filtered = compute_filtered_sessions(countries, devices, dates)
+    sessions_per_user_filtered = sessions_filtered.groupby('uid').size()
+    total_signups_filtered = len(filter_users(countries, devices))
+    total_purchases_filtered = len(sessions_filtered)  # Remplacer par le nombre d'achats si disponible
+    return {
+        'average_session_duration_minutes': sessions_filtered['session_duration_in_minutes'].mean(),
+        'average_sessions_per_user': sessions_per_user_filtered.mean(),
+        'users_daily': sessions_per_user_filtered[sessions_per_user_filtered == 1].count(),
+        'users_weekly': sessions_per_user_filtered[(sessions_per_user_filtered > 1) & (sessions_per_user_filtered <= 7)].count(),
+        'users_monthly': sessions_per_user_filtered[sessions_per_user_filtered > 7].count(),
+        'dau': sessions_filtered['session_start'].dt.date.value_counts().mean(),
+        'wau': sessions_filtered['session_start'].dt.to_period('W').value_counts().mean(),
+        'mau': sessions_filtered['session_start'].dt.to_period('M').value_counts().mean(),
+        'conversion_rate': (total_purchases_filtered / total_signups_filtered) * 100 if total_signups_filtered > 0 else 0,
+    }
+
+
+@st.cache_data
+def compute_active_users(countries, devices, dates):
+    sessions_filtered = compute_filtered_sessions(countries, devices, dates)
+    session_start = sessions_filtered['session_start']
+    valeurs_dau = sessions_filtered.groupby(session_start.dt.date).size()
+    valeurs_wau = sessions_filtered.groupby(session_start.dt.to_period('W').apply(lambda r: r.start_time)).size()
+    valeurs_mau = sessions_filtered.groupby(session_start.dt.to_period('M').apply(lambda r: r.start_time)).size()
+    return valeurs_dau, valeurs_wau, valeurs_mau
+
+
+@st.cache_data
+def compute_page_counts(countries, devices, dates):
+    filtered_sessions = compute_filtered_sessions(countries, devices, dates)
+    pages_df = filtered_sessions['visited_pages'].explode().value_counts().reset_index()
+    pages_df.columns = ['Page', 'Visites']
+    return pages_df
+
+
+@st.cache_data
+def compute_button_counts(countries, devices, dates):
+    button_pressed_time = load_button_pressed_time()
+    filtered_buttons = button_pressed_time[button_pressed_time['uid'].isin(filter_users(countries, devices)['uid'])]
+    if date_bounds(dates):
+        start_date, end_date = date_bounds(dates)
+        filtered_buttons = filtered_buttons[(filtered_buttons['time'] >= start_date) & (filtered_buttons['time'] <= end_date)]
+    button_counts_df = filtered_buttons['button'].value_counts().reset_index()
+    button_counts_df.columns = ['Button', 'Presses']
+    return button_counts_df
+
+
+# Mode approximatif : estimations à partir des échantillons stratifiés (cf. approx.py), avec
+# leur marge d'erreur à 95 %. Le calcul exact reste utilisé tant que les filtres concernent moins
+# de APPROX_ROW_THRESHOLD lignes.
+DURATION_BINS = 30
+
+
+def use_sample(approximatif, dataset, filtres):
+    # La taille du jeu complet, déjà chargé, suffit à écarter les petits volumes sans toucher aux
+    # échantillons ; au-delà, les strates (construites au préchargement) donnent la taille filtrée
+    if not approximatif or len(load_dataset(dataset)) < APPROX_ROW_THRESHOLD:
+        return False
+    return population_size(load_samples()[dataset], filtres.countries, filtres.devices, date_bounds(filtres.dates)) >= APPROX_ROW_THRESHOLD
+
+
+def sampled_rows(dataset, countries, devices, dates, start_column, end_column):
+    sample = load_samples()[dataset]
+    bounds = date_bounds(dates)
+    strata = select_strata(sample, countries, devices, bounds)
+    row_mask = None
+    if bounds:
+        start_date, end_date = bounds
+        row_mask = lambda rows: (rows[start_column] >= start_date) & (rows[end_column] <= end_date)
+    return domain_rows(sample, strata, row_mask), strata
+
+
+@st.cache_data
+def estimate_page_counts(countries, devices, dates):
+    rows, strata = sampled_rows('sessions', countries, devices, dates, 'session_start', 'session_end')
+    # Nombre de visites de chaque page dans chaque session tirée
+    visits = rows[['stratum', 'visited_pages']].explode('visited_pages').dropna().reset_index()
+    observations = visits.groupby(['index', 'stratum', 'visited_pages']).size().rename('y').reset_index()
+    estimates = estimate_totals(observations.rename(columns={'visited_pages': 'category'}), strata).reset_index()
+    estimates.columns = ['Page', 'Visites', 'Marge']
+    return estimates
+
+
+@st.cache_data
+def estimate_button_counts(countries, devices, dates):
+    rows, strata = sampled_rows('buttonPressedTime', countries, devices, dates, 'time', 'time')
+    estimates = estimate_totals(rows.assign(category=rows['button'], y=1), strata).reset_index()
+    estimates.columns = ['Button', 'Presses', 'Marge']
+    return estimates
+
+
+@st.cache_data
+def estimate_session_durations(countries, devices, dates):
+    rows, strata = sampled_rows('sessions', countries, devices, dates, 'session_start', 'session_end')
+    minutes = rows['session_duration_in_seconds'] / 60
+    edges = np.histogram_bin_edges(minutes.dropna(), bins=DURATION_BINS)
+    observations = rows.assign(category=pd.cut(minutes, edges, include_lowest=True, labels=False), y=1).dropna(subset=['category'])
+    estimates = estimate_totals(observations, strata).reindex(range(DURATION_BINS), fill_value=0).sort_index()
+    return pd.DataFrame({
+        'Durée des Sessions (minutes)': (edges[:-1] + edges[1:]) / 2,
+        'Sessions': estimates['total'].to_numpy(),
+        'Marge': estimates['margin'].to_numpy(),
+    })
+
+
+def sample_caption(dataset, filtres):
+    strata = select_strata(load_samples()[dataset], filtres.countries, filtres.devices, date_bounds(filtres.dates))
+    st.caption(f"Estimation sur un échantillon stratifié (pays, appareil, jour) de {strata['sampled'].sum():,} lignes "
+               f"sur {strata['population'].sum():,} ; barres d'erreur : intervalle de confiance à 95 %.")
+
+
+# Construction des graphiques
+def build_engagement_distribution_figure(filtres):
+    metrics = compute_metrics(*filtres)
+    return px.pie(pd.DataFrame({
+        'Fréquence': ['Quotidienne', 'Hebdomadaire', 'Mensuelle'],
+        'Utilisateurs': [metrics['users_daily'], metrics['users_weekly'], metrics['users_monthly']]
+    }), names='Fréquence', values='Utilisateurs', title='Répartition des Utilisateurs par Fréquence d\'Utilisation (Filtrée)')
+
+
+def build_active_users_figure(filtres):
+    # DAU, WAU, MAU comme des lignes séparées avec filtres
+    valeurs_dau, valeurs_wau, valeurs_mau = compute_active_users(*filtres)
+    fig_active_users_filtered = go.Figure()
+    fig_active_users_filtered.add_trace(go.Scatter(x=valeurs_dau.index, y=valeurs_dau, mode='lines', name='DAU', line=dict(color='blue')))
+    fig_active_users_filtered.add_trace(go.Scatter(x=valeurs_wau.index, y=valeurs_wau, mode='lines', name='WAU', line=dict(color='green')))
+    fig_active_users_filtered.add_trace(go.Scatter(x=valeurs_mau.index, y=valeurs_mau, mode='lines', name='MAU', line=dict(color='red')))
+    fig_active_users_filtered.update_layout(
+        title='Utilisateurs Actifs (DAU, WAU, MAU) (Filtrés)',
+        xaxis_title='Date',
+        yaxis_title='Nombre d\'Utilisateurs',
+        legend_title_text='Métriques',
+        height=400
+    )
+    return fig_active_users_filtered
+
+
+def build_engagement_users_figure(filtres):
+    # Engagement des Utilisateurs avec courbes distinctes avec filtres
+    valeurs_quotidiens, valeurs_hebdomadaires, valeurs_mensuels = compute_active_users(*filtres)
+    average_sessions_per_user = compute_metrics(*filtres)['average_sessions_per_user']
+    fig_engagement_users_filtered = go.Figure()
+    fig_engagement_users_filtered.add_trace(go.Scatter(x=valeurs_mensuels.index, y=valeurs_mensuels, mode='lines', name='Utilisateurs Mensuels', line=dict(color='red')))
+    fig_engagement_users_filtered.add_trace(go.Scatter(x=valeurs_hebdomadaires.index, y=valeurs_hebdomadaires, mode='lines', name='Utilisateurs Hebdomadaires', line=dict(color='green')))
+    fig_engagement_users_filtered.add_trace(go.Scatter(x=valeurs_quotidiens.index, y=valeurs_quotidiens, mode='lines', name='Utilisateurs Quotidiens', line=dict(color='blue')))
+    # Sessions Moyennes par Utilisateur
+    fig_engagement_users_filtered.add_trace(go.Scatter(x=valeurs_quotidiens.index, y=[average_sessions_per_user] * len(valeurs_quotidiens.index), mode='lines', name='Sessions Moyennes par Utilisateur', line=dict(color='purple')))
+    fig_engagement_users_filtered.update_layout(
+        title='Engagement des Utilisateurs (Filtré)',
+        xaxis_title='Date',
+        yaxis_title='Nombre d\'Utilisateurs / Sessions',
+        legend_title_text='Métriques',
+        height=400
+    )
+    return fig_engagement_users_filtered
+
+
+def build_most_common_pages_figure(filtres, approximatif=False):
+    if approximatif:
+        return px.bar(estimate_page_counts(*filtres), x='Visites', y='Page', orientation='h', error_x='Marge', title='Pages les Plus Visitées (estimation)')
+    return px.bar(compute_page_counts(*filtres), x='Visites', y='Page', orientation='h', title='Pages les Plus Visitées')
+
+
+def build_most_common_buttons_figure(filtres, approximatif=False):
+    if approximatif:
+        return px.bar(estimate_button_counts(*filtres), x='Presses', y='Button', orientation='h', error_x='Marge', title='Boutons les Plus Cliqués (estimation)')
+    return px.bar(compute_button_counts(*filtres), x='Presses', y='Button', orientation='h', title='Boutons les Plus Cliqués')
+
+
+def build_session_duration_figure(filtres, approximatif=False):
+    if approximatif:
+        fig_session_duration = px.bar(estimate_session_durations(*filtres), x='Durée des Sessions (minutes)', y='Sessions', error_y='Marge',
+                                      title='Distribution des Durées des Sessions (minutes, estimation)')
+        fig_session_duration.update_layout(bargap=0)
+        return fig_session_duration
+    return px.histogram(compute_filtered_sessions(*filtres), x='session_duration_in_minutes', title='Distribution des Durées des Sessions (minutes)', labels={'session_duration_in_minutes': 'Durée des Sessions (minutes)'})
+
+
+# Sections de la page
+ONGLETS = ["Taux de Conversion", "Utilisateurs Actifs", "Engagement des Utilisateurs", "Durée des Sessions"]
+
+
+@st.fragment
+def metrics_section(filtres):
+    # Seul l'onglet sélectionné est calculé et affiché ; changer d'onglet ne réexécute que ce fragment
+    onglet = st.radio("Métriques", ONGLETS, horizontal=True, key='engagement_onglet', label_visibility='collapsed')
+    metrics = compute_metrics(*filtres)
+
+    if onglet == "Taux de Conversion":
+        st.metric(label="Taux de Conversion", value=f"{metrics['conversion_rate']:.2f}%")
+    elif onglet == "Utilisateurs Actifs":
+        st.metric(label="Quotidien (DAU)", value=f"{metrics['dau']:.2f}")
+        st.metric(label="Hebdomadaire (WAU)", value=f"{metrics['wau']:.2f}")
+        st.metric(label="Mensuel (MAU)", value=f"{metrics['mau']:.2f}")
+        st.plotly_chart(build_active_users_figure(filtres), use_container_width=True)
+    elif onglet == "Engagement des Utilisateurs":
+        st.metric(label="Utilisateurs Quotidiens", value=f"{metrics['users_daily']:.2f}")
+        st.metric(label="Utilisateurs Hebdomadaires", value=f"{metrics['users_weekly']:.2f}")
+        st.metric(label="Utilisateurs Mensuels", value=f"{metrics['users_monthly']:.2f}")
+        st.metric(label="Sessions Moyennes par Utilisateur", value=f"{metrics['average_sessions_per_user']:.2f}")
+        st.plotly_chart(build_engagement_users_figure(filtres), use_container_width=True)
+    else:
+        st.metric(label="Durée Moyenne des Sessions (minutes)", value=f"{metrics['average_session_duration_minutes']:.2f}")
+
+
+@st.fragment
+def engagement_distribution_section(filtres):
+    st.subheader('Répartition des Utilisateurs par Fréquence d\'Utilisation (Filtrée)')
+    st.plotly_chart(build_engagement_distribution_figure(filtres), use_container_width=True)
+
+
+@st.fragment
+def most_common_pages_section(filtres, approximatif):
+    st.subheader('Pages et Fonctionnalités les Plus Utilisées')
+    approximatif = use_sample(approximatif, 'sessions', filtres)
+    st.plotly_chart(build_most_common_pages_figure(filtres, approximatif), use_container_width=True)
+    if approximatif:
+        sample_caption('sessions', filtres)
+
+
+@st.fragment
+def most_common_buttons_section(filtres, approximatif):
+    approximatif = use_sample(approximatif, 'buttonPressedTime', filtres)
+    st.plotly_chart(build_most_common_buttons_figure(filtres, approximatif), use_container_width=True)
+    if approximatif:
+        sample_caption('buttonPressedTime', filtres)
+
+
+@st.fragment
+def session_duration_section(filtres, approximatif):
+    st.subheader('Distribution des Durées des Sessions (minutes)')
+    approximatif = use_sample(approximatif, 'sessions', filtres)
+    st.plotly_chart(build_session_duration_figure(filtres, approximatif), use_container_width=True)
+    if approximatif:
+        sample_caption('sessions', filtres)
+
+
+FORECAST_METRICS = {'active_users': 'Utilisateurs Actifs Quotidiens', 'transactions': 'Transactions'}
+
+
+@st.fragment
+def forecast_section():
+    # Ne dépend d'aucun filtre : les prévisions sont lues depuis les modèles déjà ajustés
+    st.subheader('Prévisions par Segment (Pays, Appareil)')
+    forecasts = load_forecasts()
+    if forecasts is None:
+        st.info("Aucune prévision disponible : exécutez `python forecast.py` après la construction des tables dérivées.")
+        return
+
+    segments = list(forecasts[['country', 'device']].drop_duplicates().itertuples(index=False, name=None))
+    country, device = st.selectbox("Segment", options=segments, format_func=lambda segment: f"{segment[0]} / {segment[1]}", key='forecast_segment')
+    metric = st.radio("Métrique", list(FORECAST_METRICS), format_func=FORECAST_METRICS.get, horizontal=True, key='forecast_metric')
+
+    history = load_forecast_histories().get((country, device))
+    prediction = forecasts[(forecasts['country'] == country) & (forecasts['device'] == device) & (forecasts['metric'] == metric)]
+
+    fig_forecast = go.Figure()
+    if history is not None:
+        fig_forecast.add_trace(go.Scatter(x=history['date'], y=history[metric], mode='lines', name='Historique', line=dict(color='blue')))
+    fig_forecast.add_trace(go.Scatter(x=prediction['date'], y=prediction['yhat_upper'], mode='lines', line=dict(width=0), showlegend=False))
+    fig_forecast.add_trace(go.Scatter(x=prediction['date'], y=prediction['yhat_lower'], mode='lines', line=dict(width=0), fill='tonexty',
+                                      fillcolor='rgba(255, 165, 0, 0.2)', name='Intervalle de confiance'))
+    fig_forecast.add_trace(go.Scatter(x=prediction['date'], y=prediction['yhat'], mode='lines', name='Prévision', line=dict(color='orange', dash='dash')))
+    fig_forecast.update_layout(
+        title=f"{FORECAST_METRICS[metric]} - {country} / {device}",
+        xaxis_title='Date',
+        yaxis_title=FORECAST_METRICS[metric],
+        height=400
+    )
+    st.plotly_chart(fig_forecast, use_container_width=True)
+
 
 # Fonction de génération de rapport
-def generate_report():
+def generate_report(filtres):
+    metrics = compute_metrics(*filtres)
     report = f"""
     ## Rapport Automatique
 
@@ -185,61 +316,58 @@ def generate_report():
 
     **Métriques Clés:**
 
-    - **Taux de Conversion:** Le taux de conversion, représentant le pourcentage d'utilisateurs ayant effectué une action significative, est de **{conversion_rate_filtered:.2f}%**. Cela signifie que sur l'ensemble des utilisateurs inscrits, environ {conversion_rate_filtered:.2f}% ont réalisé l'action ciblée.
-    
+    - **Taux de Conversion:** Le taux de conversion, représentant le pourcentage d'utilisateurs ayant effectué une action significative, est de **{metrics['conversion_rate']:.2f}%**. Cela signifie que sur l'ensemble des utilisateurs inscrits, environ {metrics['conversion_rate']:.2f}% ont réalisé l'action ciblée.
+
     - **Utilisateurs Actifs:**
-        - **Quotidien (DAU):** En moyenne, **{dau_filtered:.2f}** utilisateurs sont actifs chaque jour, montrant un engagement constant et régulier.
-        - **Hebdomadaire (WAU):** Sur une base hebdomadaire, environ **{wau_filtered:.2f}** utilisateurs se connectent et interagissent avec l'application.
-        - **Mensuel (MAU):** **{mau_filtered:.2f}** utilisateurs uniques utilisent l'application chaque mois, indiquant une base d'utilisateurs fidèle sur le long terme.
-    
-    - **Durée Moyenne des Sessions:** Les sessions durent en moyenne **{average_session_duration_minutes_filtered:.2f} minutes**, ce qui montre un bon niveau d'engagement par session.
-    
+        - **Quotidien (DAU):** En moyenne, **{metrics['dau']:.2f}** utilisateurs sont actifs chaque jour, montrant un engagement constant et régulier.
+        - **Hebdomadaire (WAU):** Sur une base hebdomadaire, environ **{metrics['wau']:.2f}** utilisateurs se connectent et interagissent avec l'application.
+        - **Mensuel (MAU):** **{metrics['mau']:.2f}** utilisateurs uniques utilisent l'application chaque mois, indiquant une base d'utilisateurs fidèle sur le long terme.
+
+    - **Durée Moyenne des Sessions:** Les sessions durent en moyenne **{metrics['average_session_duration_minutes']:.2f} minutes**, ce qui montre un bon niveau d'engagement par session.
+
     - **Engagement des Utilisateurs:**
-        - **Nombre Moyen de Sessions par Utilisateur:** Chaque utilisateur participe en moyenne à **{average_sessions_per_user_filtered:.2f}** sessions, ce qui reflète leur engagement avec l'application.
-        - **Utilisateurs Quotidiens:** **{users_daily_filtered}** utilisateurs se connectent au moins une fois par jour.
-        - **Utilisateurs Hebdomadaires:** **{users_weekly_filtered}** utilisateurs interagissent avec l'application chaque semaine.
-        - **Utilisateurs Mensuels:** **{users_monthly_filtered}** utilisateurs actifs chaque mois, démontrant une fidélité continue.
+        - **Nombre Moyen de Sessions par Utilisateur:** Chaque utilisateur participe en moyenne à **{metrics['average_sessions_per_user']:.2f}** sessions, ce qui reflète leur engagement avec l'application.
+        - **Utilisateurs Quotidiens:** **{metrics['users_daily']}** utilisateurs se connectent au moins une fois par jour.
+        - **Utilisateurs Hebdomadaires:** **{metrics['users_weekly']}** utilisateurs interagissent avec l'application chaque semaine.
+        - **Utilisateurs Mensuels:** **{metrics['users_monthly']}** utilisateurs actifs chaque mois, démontrant une fidélité continue.
 
     Ce rapport fournit une vue d'ensemble détaillée de l'engagement et de la fidélité des utilisateurs de l'application Dhoola. En observant les taux de conversion et les métriques d'activité, les décideurs peuvent identifier les points forts et les opportunités d'amélioration pour augmenter l'engagement et la satisfaction des utilisateurs.
     """
     return report
 
-# Fonction pour créer un PDF
-def create_pdf(report, filename="rapport.pdf"):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    
-    # Ajouter le rapport texte
-    for line in report.split('\n'):
-        if line.strip() == "":
-            pdf.ln(10)  # Add a new line for empty lines
-        else:
-            pdf.multi_cell(0, 10, txt=line)
-    
-    # Ajouter les graphiques
-    graphs = [
-        (fig_engagement_distribution_filtered, "engagement_distribution.png"),
-        (fig_active_users_filtered, "active_users.png"),
-        (fig_engagement_users_filtered, "engagement_users.png"),
-        (fig_most_common_pages, "most_common_pages.png"),
-        (fig_most_common_buttons, "most_common_buttons.png"),
-        (fig_session_duration, "session_duration.png")
+# Graphiques du rapport (construits uniquement lors de la génération du rapport)
+def report_graphs(filtres):
+    return [
+        (build_engagement_distribution_figure(filtres), "engagement_distribution.png"),
+        (build_active_users_figure(filtres), "active_users.png"),
+        (build_engagement_users_figure(filtres), "engagement_users.png"),
+        (build_most_common_pages_figure(filtres), "most_common_pages.png"),
+        (build_most_common_buttons_figure(filtres), "most_common_buttons.png"),
+        (build_session_duration_figure(filtres), "session_duration.png")
     ]
-    
-    with tempfile.TemporaryDirectory() as tmpdirname:
-        for fig, file_name in graphs:
-            img_path = os.path.join(tmpdirname, file_name)
-            pio.write_image(fig, img_path, engine="kaleido")
-            pdf.add_page()
-            pdf.image(img_path, x=10, y=10, w=190)
-    
-    pdf.output(filename)
-
-# Bouton pour générer le rapport
-if st.button('Générer le Rapport'):
-    report = generate_report()
-    st.markdown(report)
-    create_pdf(report)
-    with open("rapport.pdf", "rb") as pdf_file:
-        st.download_button(label="Télécharger le rapport en PDF", data=pdf_file, file_name="rapport.pdf", mime="application/pdf")
\ No newline at end of file
+
+
+@st.fragment
+def report_section(filtres):
+    # Bouton pour générer le rapport : seul ce fragment est réexécuté au clic
+    if st.button('Générer le Rapport'):
+        report = generate_report(filtres)
+        st.markdown(report)
+        create_pdf(report, report_graphs(filtres))
+        with open("rapport.pdf", "rb") as pdf_file:
+            st.download_button(label="Télécharger le rapport en PDF", data=pdf_file, file_name="rapport.pdf", mime="application/pdf")
+
+
+# Interface utilisateur Streamlit
+filtres = sidebar_filtres()
+approximatif = st.sidebar.toggle("Mode approximatif", key='approx_mode',
+                                 help=f"Estime les pages, boutons et durées de sessions sur un échantillon stratifié au-delà de {APPROX_ROW_THRESHOLD:,} lignes")
+
+st.title('Métriques de l\'Application')
+metrics_section(filtres)
+engagement_distribution_section(filtres)
+most_common_pages_section(filtres, approximatif)
+most_common_buttons_section(filtres, approximatif)
+session_duration_section(filtres, approximatif)
+forecast_section()
+report_section(filtres)
@@ -3,26 +3,19 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
-# Charger les données
-users = pd.read_csv('users.csv')
-sessions = pd.read_csv('sessions_with_pages_true.csv')
+from data_loader import load_sessions, load_users
 
-# Convertir les colonnes de date en datetime si nécessaire
-if 'creationTime' in users.columns:
-    users['creationTime'] = pd.to_datetime(users['creationTime'], errors='coerce')
-
-if 'session_start' in sessions.columns:
-    sessions['session_start'] = pd.to_datetime(sessions['session_start'], errors='coerce')
-if 'session_end' in sessions.columns:
-    sessions['session_end'] = pd.to_datetime(sessions['session_end'], errors='coerce')
+# Charger les données (validées et typées à l'export)
+users = load_users()
+sessions = load_sessions()
 
 # Widgets interactifs pour le filtrage
 selected_country = st.sidebar.multiselect("Sélectionnez les pays", options=users['country'].unique(), key='country_selector')
 date_range = st.sidebar.date_input("Sélectionnez la plage de dates", [])
 
 # Filtrage des données selon les sélections
-filtered_users = users.copy()
-filtered_sessions = sessions.copy()
+filtered_users = users
+filtered_sessions = sessions
 
 # Filtrer par pays
 if selected_country:
@@ -38,15 +31,12 @@ if len(date_range) == 2:
 
 # Carte mondiale avec segmentation par continent
 st.subheader('Répartition Géographique Globale')
-if 'country' in filtered_users.columns:
-    fig_continent = px.choropleth(filtered_users, locations='country', locationmode='country names',
-                                  color='country', hover_name='country', title='Utilisateurs par Pays et Continent',
-                                  projection='natural earth')
-    fig_continent.update_geos(showcoastlines=True, coastlinecolor="Black", showland=True, landcolor="LightGray",
-                              showocean=True, oceancolor="LightBlue")
-    st.plotly_chart(fig_continent, use_container_width=True)
-else:
-    st.warning("La colonne 'country' n'est pas présente dans le DataFrame filtered_users.")
+fig_continent = px.choropleth(filtered_users, locations='country', locationmode='country names',
+                              color='country', hover_name='country', title='Utilisateurs par Pays et Continent',
+                              projection='natural earth')
+fig_continent.update_geos(showcoastlines=True, coastlinecolor="Black", showland=True, landcolor="LightGray",
+                          showocean=True, oceancolor="LightBlue")
+st.plotly_chart(fig_continent, use_container_width=True)
 
 
 
@@ -79,16 +69,12 @@ else:
 
 # 4. Segmentation par Type d'Appareil et Localisation
 st.subheader('Segmentation par Type d\'Appareil et Localisation')
-if 'country' in filtered_users.columns and 'isAndroid' in filtered_users.columns:
-    user_device_country = filtered_users.groupby(['country', 'isAndroid']).size().reset_index(name='count')
-    user_device_country['device'] = user_device_country['isAndroid'].apply(lambda x: 'Android' if x else 'iOS')
-    
-    fig_device_country = px.bar(user_device_country, x='count', y='country', color='device',
-                                title='Segmentation par Type d\'Appareil et Localisation',
-                                labels={'count': 'Nombre d\'Utilisateurs', 'country': 'Pays'})
-    st.plotly_chart(fig_device_country, use_container_width=True)
-else:
-    st.warning("Les colonnes 'country' et 'isAndroid' ne sont pas présentes dans le DataFrame `filtered_users`.")
+user_device_country = filtered_users.groupby(['country', 'device']).size().reset_index(name='count')
+
+fig_device_country = px.bar(user_device_country, x='count', y='country', color='device',
+                            title='Segmentation par Type d\'Appareil et Localisation',
+                            labels={'count': 'Nombre d\'Utilisateurs', 'country': 'Pays'})
+st.plotly_chart(fig_device_country, use_container_width=True)
 
 # 5. Analyse des Sessions par Localisation
 # st.subheader('Analyse des Sessions par Localisation')
@@ -122,29 +108,22 @@ else:
 
 # 7. Tendances Géographiques au Fil du Temps
 st.subheader('Tendances Géographiques au Fil du Temps')
-if 'creationTime' in filtered_users.columns and 'country' in filtered_users.columns:
-    filtered_users['year_month'] = filtered_users['creationTime'].dt.to_period('M').astype(str)
-    geo_trend = filtered_users.groupby(['year_month', 'country']).size().reset_index(name='count')
-    
-    fig_geo_trend = px.line(geo_trend, x='year_month', y='count', color='country',
-                             title='Tendances Géographiques au Fil du Temps',
-                             labels={'year_month': 'Période', 'count': 'Nombre d\'Utilisateurs'},
-                             markers=True)
-    
-    st.plotly_chart(fig_geo_trend, use_container_width=True)
-else:
-    st.warning("Les colonnes 'creationTime' et 'country' ne sont pas présentes dans le DataFrame `filtered_users`.")
+year_month = filtered_users['creationTime'].dt.to_period('M').astype(str).rename('year_month')
+geo_trend = filtered_users.groupby([year_month, 'country']).size().reset_index(name='count')
+
+fig_geo_trend = px.line(geo_trend, x='year_month', y='count', color='country',
+                         title='Tendances Géographiques au Fil du Temps',
+                         labels={'year_month': 'Période', 'count': 'Nombre d\'Utilisateurs'},
+                         markers=True)
+
+st.plotly_chart(fig_geo_trend, use_container_width=True)
 # 8. Nombre d'Utilisateurs Actifs par Jour de la Semaine
 st.subheader('Nombre d\'Utilisateurs Actifs par Jour de la Semaine')
-if 'session_start' in filtered_sessions.columns:
-    filtered_sessions['day_of_week'] = filtered_sessions['session_start'].dt.day_name()
-    active_users_per_day = filtered_sessions.groupby('day_of_week').size().reindex(
-        ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']).reset_index(name='count')
-    
-    fig_users_per_day = px.bar(active_users_per_day, x='day_of_week', y='count',
-                               title='Nombre d\'Utilisateurs Actifs par Jour de la Semaine',
-                               labels={'day_of_week': 'Jour de la Semaine', 'count': 'Nombre d\'Utilisateurs'},
-                               color='day_of_week')
-    st.plotly_chart(fig_users_per_day, use_container_width=True)
-else:
-    st.warning("La colonne 'session_start' n'est pas présente dans le DataFrame `filtered_sessions`.")
+active_users_per_day = filtered_sessions.groupby(filtered_sessions['session_start'].dt.day_name().rename('day_of_week')).size().reindex(
+    ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']).reset_index(name='count')
+
+fig_users_per_day = px.bar(active_users_per_day, x='day_of_week', y='count',
+                           title='Nombre d\'Utilisateurs Actifs par Jour de la Semaine',
+                           labels={'day_of_week': 'Jour de la Semaine', 'count': 'Nombre d\'Utilisateurs'},
+                           color='day_of_week')
+st.plotly_chart(fig_users_per_day, use_container_width=True)
@@ -0,0 +1,52 @@
+import streamlit as st
+import plotly.express as px
+
+from data_loader import load_user_index, load_users
+from user_index import user_timeline
+
+# Charger les utilisateurs et l'index par uid (construit une seule fois par processus)
+users = load_users()
+index = load_user_index()
+
+# Sélection de l'utilisateur : par nom parmi les utilisateurs connus, ou directement par uid
+noms = dict(zip(users['uid'], users['first_name'] + ' ' + users['last_name']))
+uid_saisi = st.sidebar.text_input("Saisissez un uid", key='user_uid').strip()
+uid_selectionne = st.sidebar.selectbox("Sélectionnez un utilisateur", options=list(noms),
+                                       format_func=lambda uid: f"{noms[uid]} ({uid})", key='user_selector')
+uid = uid_saisi or uid_selectionne
+
+st.title('Parcours Utilisateur')
+st.subheader(f"{noms.get(uid, 'Utilisateur inconnu')} ({uid})")
+
+# Nombre d'événements par table, lu directement dans les offsets de l'index
+counts = {label: int(table_index.counts([uid])[0]) for label, table_index in index.items()}
+columns = st.columns(4)
+for column, (label, count) in zip(columns * 2, counts.items()):
+    column.metric(label=label, value=count)
+
+timeline = user_timeline(index, uid)
+if timeline.empty:
+    st.warning("Aucune activité enregistrée pour cet utilisateur.")
+else:
+    # Chronologie complète de l'utilisateur
+    st.subheader('Chronologie des Événements')
+    fig_timeline = px.scatter(timeline, x='time', y='event', color='event',
+                              title='Chronologie des Événements',
+                              labels={'time': 'Date', 'event': 'Événement'})
+    fig_timeline.update_layout(showlegend=False)
+    st.plotly_chart(fig_timeline, use_container_width=True)
+
+    # Activité quotidienne
+    st.subheader('Activité Quotidienne')
+    daily_activity = timeline.groupby([timeline['time'].dt.date.rename('date'), 'event']).size().reset_index(name='count')
+    fig_daily = px.bar(daily_activity, x='date', y='count', color='event',
+                       title='Activité Quotidienne',
+                       labels={'date': 'Date', 'count': 'Nombre d\'Événements', 'event': 'Événement'})
+    st.plotly_chart(fig_daily, use_container_width=True)
+
+    # Détail par table
+    st.subheader('Détail des Événements')
+    for label, table_index in index.items():
+        if counts[label]:
+            with st.expander(f"{label} ({counts[label]})"):
+                st.dataframe(table_index.lookup(uid), use_container_width=True)
@@ -1,10 +1,20 @@
 import streamlit as st
 
+from data_loader import prewarm, sync_dataset_version
+
+# Basculer sur la dernière version publiée du magasin partagé, le cas échéant
+sync_dataset_version()
+
 Dashboard_page = st.Page("Dashboard.py", title="Tableau de bord ", icon=":material/dashboard:")
 Usage_page = st.Page("Usage.py", title="Audience", icon="📈")
 Engagement_page = st.Page("Engagement.py", title="Données analytiques", icon="📲")
 Maps_page = st.Page("Maps.py", title="Données géographique ", icon="🌐")
+Utilisateur_page = st.Page("Utilisateur.py", title="Parcours utilisateur", icon="👤")
 
-pg = st.navigation([Dashboard_page, Usage_page,Engagement_page,Maps_page])
+pg = st.navigation([Dashboard_page, Usage_page,Engagement_page,Maps_page,Utilisateur_page])
 st.set_page_config(page_title="Data manager", page_icon=":bar_chart:")
-pg.run()
\ No newline at end of file
+pg.run()
+
+# Précharger les autres jeux de données, l'index par uid et les échantillons une fois la première
+# page rendue : le préchargement ne ralentit pas ce rendu et prépare les pages suivantes
+prewarm()
\ No newline at end of file
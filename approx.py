@@ -0,0 +1,82 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Mode approximatif : des échantillons stratifiés par (pays, appareil, jour) sont construits une
+# fois, puis les comptes (pages, boutons, classes de durée) sont estimés à partir de l'échantillon
+# avec l'estimateur stratifié du total et son intervalle de confiance à 95 %. En dessous de
+# APPROX_ROW_THRESHOLD lignes, les pages restent sur le calcul exact.
+
+SAMPLE_FRACTION = 0.1
+# Nombre minimal de lignes tirées par strate (toutes si la strate est plus petite)
+MIN_STRATUM_SAMPLE = 5
+APPROX_ROW_THRESHOLD = 50_000
+Z_95 = 1.96
+STRATUM_KEYS = ['country', 'device', 'day']
+
+
+class StratifiedSample(NamedTuple):
+    rows: pd.DataFrame    # lignes tirées, avec leur strate
+    strata: pd.DataFrame  # une ligne par strate : clés, population (N_h) et taille d'échantillon (n_h)
+
+
+def build_sample(df, time_column, fraction=SAMPLE_FRACTION, seed=0):
+    # df doit déjà porter les colonnes country et device de l'utilisateur
+    df = df.assign(day=df[time_column].dt.normalize())
+    grouped = df.groupby(STRATUM_KEYS, sort=False, dropna=False)
+    stratum = grouped.ngroup()
+    population = grouped[time_column].transform('size')
+
+    # Tirage sans remise dans chaque strate : on garde les n_h plus petits tirages aléatoires
+    rank = pd.Series(np.random.default_rng(seed).random(len(df)), index=df.index).groupby(stratum).rank(method='first')
+    size = np.maximum(np.ceil(population * fraction), np.minimum(MIN_STRATUM_SAMPLE, population))
+    rows = df[rank <= size].assign(stratum=stratum[rank <= size])
+
+    strata = df.assign(stratum=stratum).groupby('stratum')[STRATUM_KEYS].first()
+    strata['population'] = stratum.value_counts().sort_index()
+    strata['sampled'] = rows['stratum'].value_counts().reindex(strata.index, fill_value=0)
+    return StratifiedSample(rows.reset_index(drop=True), strata)
+
+
+def select_strata(sample, countries, devices, bounds):
+    strata = sample.strata
+    mask = pd.Series(True, index=strata.index)
+    if countries:
+        mask &= strata['country'].isin(countries)
+    if devices:
+        mask &= strata['device'].isin(devices)
+    if bounds:
+        start, end = bounds
+        mask &= (strata['day'] >= start.normalize()) & (strata['day'] <= end)
+    return strata[mask]
+
+
+def population_size(sample, countries, devices, bounds):
+    # Nombre de lignes concernées par les filtres, lu dans la table des strates sans parcourir les données
+    return int(select_strata(sample, countries, devices, bounds)['population'].sum())
+
+
+def estimate_totals(observations, strata):
+    # observations : une ligne par (ligne échantillonnée, catégorie) avec sa valeur y non nulle ;
+    # les valeurs nulles n'ont pas à figurer. Estimateur stratifié du total de chaque catégorie :
+    #   total = sum_h N_h * moyenne_h(y),  var = sum_h N_h^2 (1 - n_h/N_h) s_h^2 / n_h
+    sums = observations.groupby(['stratum', 'category'])['y'].agg(s1='sum', s2=lambda y: (y ** 2).sum()).reset_index()
+    sums = sums.merge(strata[['population', 'sampled']], left_on='stratum', right_index=True)
+    n, big_n = sums['sampled'], sums['population']
+    mean = sums['s1'] / n
+    variance = ((sums['s2'] - n * mean ** 2) / (n - 1)).where(n > 1, 0).clip(lower=0)
+    sums['total'] = big_n * mean
+    sums['variance'] = big_n ** 2 * (1 - n / big_n) * variance / n
+    estimates = sums.groupby('category')[['total', 'variance']].sum()
+    estimates['margin'] = Z_95 * np.sqrt(estimates['variance'])
+    return estimates[['total', 'margin']].sort_values('total', ascending=False)
+
+
+def domain_rows(sample, strata, row_mask=None):
+    # Lignes échantillonnées des strates retenues ; row_mask écarte en plus les lignes hors du
+    # domaine (elles comptent alors pour y = 0, sans changer N_h ni n_h)
+    rows = sample.rows[sample.rows['stratum'].isin(strata.index)]
+    if row_mask is not None:
+        rows = rows[row_mask(rows)]
+    return rows
@@ -0,0 +1,57 @@
+import argparse
+import statistics
+import subprocess
+import sys
+
+# Mesure du chemin réel d'un serveur qui vient de redémarrer, dans un processus neuf à chaque
+# essai : premier rendu de app.py (page d'accueil, préchargement lancé par app.py lui-même), puis,
+# après une courte pause (le temps qu'un visiteur clique), rendu d'une autre page. Streamlit
+# lui-même est importé avant le chronomètre. Avec --no-prewarm, le préchargement est désactivé
+# pour comparaison.
+
+PAGES = ['Usage.py', 'Engagement.py', 'Maps.py', 'Utilisateur.py']
+
+SNIPPET = """
+import sys, time
+from streamlit.testing.v1 import AppTest
+import data_loader
+if not {prewarm}:
+    data_loader.prewarm = lambda: None
+start = time.perf_counter()
+at = AppTest.from_file('app.py', default_timeout=300).run()
+first = time.perf_counter() - start
+if at.exception:
+    sys.exit(at.exception[0].message)
+time.sleep({pause})
+start = time.perf_counter()
+at.switch_page({page!r}).run()
+second = time.perf_counter() - start
+if at.exception:
+    sys.exit(at.exception[0].message)
+print(first, second)
+"""
+
+
+def time_visit(page, prewarm=True, pause=1.0):
+    result = subprocess.run([sys.executable, '-c', SNIPPET.format(page=page, prewarm=prewarm, pause=pause)],
+                            capture_output=True, text=True, check=True)
+    first, second = result.stdout.strip().splitlines()[-1].split()
+    return float(first), float(second)
+
+
+def summary(timings):
+    return f"médiane {statistics.median(timings) * 1000:.0f} ms (min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms)"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure le premier rendu de l'application puis celui d'une seconde page.")
+    parser.add_argument('pages', nargs='*', default=PAGES, help="page ouverte après la page d'accueil")
+    parser.add_argument('--runs', type=int, default=5, help="nombre d'essais par page")
+    parser.add_argument('--pause', type=float, default=1.0, help="secondes entre le premier rendu et la seconde page")
+    parser.add_argument('--no-prewarm', action='store_true', help="désactiver le préchargement lancé par app.py")
+    args = parser.parse_args()
+
+    for page in args.pages:
+        timings = [time_visit(page, not args.no_prewarm, args.pause) for _ in range(args.runs)]
+        print(f"{page}: premier rendu de app.py {summary([first for first, _ in timings])}, "
+              f"puis {page} {summary([second for _, second in timings])}")
@@ -0,0 +1,269 @@
+import argparse
+import hashlib
+import importlib
+import inspect
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, NamedTuple
+
+import pandas as pd
+
+# Graphe de construction des tables dérivées : exports bruts -> tables dérivées -> agrégats.
+# Chaque nœud déclare ses entrées ; il n'est reconstruit que si l'empreinte (SHA-256) de ses
+# entrées ou de son code a changé depuis la dernière construction. Les nœuds indépendants sont
+# construits en parallèle sur plusieurs processus. L'empreinte du code couvre la fonction de
+# construction, les fonctions et modules dont le nœud déclare dépendre, et les constantes de
+# module que ces fonctions utilisent (SESSION_THRESHOLD par exemple).
+
+MANIFEST_FILE = '.build_manifest.json'
+
+# Au-delà de cet écart entre deux ouvertures de l'application, une nouvelle session commence
+SESSION_THRESHOLD = 30 * 60  # 30 minutes en secondes
+
+
+class Node(NamedTuple):
+    inputs: tuple
+    build: Callable
+    # Code utilisé par la construction : fonctions, ou noms de modules dont tout le source compte
+    depends: tuple = ()
+
+
+def write_csv(df, output):
+    # Fins de ligne CRLF, comme les fichiers déjà versionnés, pour des sorties identiques octet par octet
+    df.to_csv(output, index=False, lineterminator='\r\n')
+
+
+def load_app_opened_time(path):
+    # Charger les ouvertures de l'application et convertir le temps de millisecondes en datetime
+    df = pd.read_csv(path)
+    df['time'] = pd.to_datetime(df['time'], unit='ms')
+    return df
+
+
+def split_sessions(path):
+    df = load_app_opened_time(path)
+
+    # Trier les données par utilisateur et par temps
+    df.sort_values(by=['uid', 'time'], inplace=True)
+
+    # Calculer la différence de temps entre les événements consécutifs
+    df['time_diff'] = df.groupby('uid')['time'].diff().dt.total_seconds()
+    df['new_session'] = (df['time_diff'] > SESSION_THRESHOLD) | df['time_diff'].isna()
+
+    # Assigner un identifiant unique pour chaque session
+    df['session_id'] = df.groupby('uid')['new_session'].cumsum()
+    df['date'] = df['time'].dt.date
+    return df
+
+
+def build_app_opened_time_trues(inputs, output):
+    df = load_app_opened_time(inputs[0])
+    df['date'] = df['time'].dt.date
+    df['heure'] = df['time'].dt.time
+    write_csv(df, output)
+
+
+def build_dates(inputs, output):
+    df = load_app_opened_time(inputs[0])
+    df['Date'] = df['time'].dt.date
+    write_csv(df[['Date']], output)
+
+
+def build_session_duration(inputs, output):
+    df = split_sessions(inputs[0])
+    session_duration_per_day = df.groupby(['uid', 'date', 'session_id'])['time_diff'].sum().reset_index()
+    session_duration_per_day.rename(columns={'time_diff': 'session_duration_in_seconds'}, inplace=True)
+    write_csv(session_duration_per_day, output)
+
+
+def build_total_session_duration(inputs, output):
+    df = split_sessions(inputs[0])
+    session_duration_per_day = df.groupby(['uid', 'date'])['time_diff'].sum().reset_index()
+    session_duration_per_day.rename(columns={'time_diff': 'total_session_duration_in_seconds'}, inplace=True)
+    write_csv(session_duration_per_day, output)
+
+
+def build_session_times(inputs, output):
+    df = split_sessions(inputs[0])
+
+    # Définir l'heure de début et l'heure de fin pour chaque session
+    session_times = df.groupby(['uid', 'date', 'session_id']).agg(
+        session_start=('time', 'min'),
+        session_end=('time', 'max')
+    ).reset_index()
+    session_times['session_duration_in_seconds'] = (session_times['session_end'] - session_times['session_start']).dt.total_seconds()
+    write_csv(session_times, output)
+
+
+def build_sessions_with_pages(inputs, output):
+    sessions = pd.read_csv(inputs[0])
+    pages = pd.read_csv(inputs[1])
+    sessions['session_start'] = pd.to_datetime(sessions['session_start'])
+    sessions['session_end'] = pd.to_datetime(sessions['session_end'])
+    pages['time'] = pd.to_datetime(pages['time'], unit='ms')
+    pages_true = pages[pages['isIn'] == True]
+
+    # Associer les pages visitées aux sessions : jointure sur l'utilisateur puis filtrage sur la
+    # fenêtre de la session, en conservant l'ordre des pages du fichier source
+    candidates = sessions[['uid', 'session_start', 'session_end']].reset_index().merge(
+        pages_true[['uid', 'time', 'page']].reset_index(names='page_order'), on='uid')
+    in_session = candidates[(candidates['time'] >= candidates['session_start']) &
+                            (candidates['time'] <= candidates['session_end'])]
+    visited_pages = in_session.sort_values(['index', 'page_order']).groupby('index')['page'].agg(list)
+
+    sessions['visited_pages'] = visited_pages.reindex(sessions.index)
+    sessions['visited_pages'] = sessions['visited_pages'].apply(lambda pages: pages if isinstance(pages, list) else [])
+    write_csv(sessions, output)
+
+
+def build_daily_segment_rollup(inputs, output):
+    from validation import validate_collection
+
+    sessions = pd.read_csv(inputs[0])
+    transactions = pd.read_csv(inputs[1])
+    users, _, _ = validate_collection('users', pd.read_csv(inputs[2]), {})
+
+    # Segment (pays, appareil) de chaque utilisateur ; les uid inconnus forment leur propre segment
+    segments = users[['uid', 'country', 'device']].astype(str)
+    sessions['date'] = pd.to_datetime(sessions['session_start']).dt.date
+    transactions['date'] = pd.to_datetime(transactions['creationTime'], unit='ms').dt.date
+    sessions = sessions.merge(segments, on='uid', how='left')
+    transactions = transactions.merge(segments, left_on='payeurUid', right_on='uid', how='left')
+
+    keys = ['date', 'country', 'device']
+    activity = sessions.fillna({'country': 'Inconnu', 'device': 'Inconnu'}).groupby(keys).agg(
+        active_users=('uid', 'nunique'),
+        sessions=('uid', 'size'),
+    )
+    purchases = transactions.fillna({'country': 'Inconnu', 'device': 'Inconnu'}).groupby(keys).size().rename('transactions')
+    rollup = activity.join(purchases, how='outer').fillna(0).astype(int).reset_index()
+    write_csv(rollup.sort_values(keys), output)
+
+
+# Graphe : sortie -> (entrées, fonction de construction)
+NODES = {
+    'appOpenedTimeTrues.csv': Node(('appOpenedTime.csv',), build_app_opened_time_trues, (load_app_opened_time, write_csv)),
+    'dates.csv': Node(('appOpenedTime.csv',), build_dates, (load_app_opened_time, write_csv)),
+    'session_duration_per_user_per_day.csv': Node(('appOpenedTime.csv',), build_session_duration,
+                                                  (split_sessions, load_app_opened_time, write_csv)),
+    'total_session_duration_per_user_per_day.csv': Node(('appOpenedTime.csv',), build_total_session_duration,
+                                                        (split_sessions, load_app_opened_time, write_csv)),
+    'session_times_per_user_per_day.csv': Node(('appOpenedTime.csv',), build_session_times,
+                                               (split_sessions, load_app_opened_time, write_csv)),
+    'sessions_with_pages_true.csv': Node(('session_times_per_user_per_day.csv', 'pageOpenedTime.csv'), build_sessions_with_pages,
+                                         (write_csv,)),
+    'daily_segment_rollup.csv': Node(('sessions_with_pages_true.csv', 'transaction.csv', 'users.csv'), build_daily_segment_rollup,
+                                     (write_csv, 'validation')),
+}
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def used_constants(code, namespace):
+    # Constantes de module lues par une fonction (y compris dans ses fonctions imbriquées)
+    constants = {}
+    for name in code.co_names:
+        value = namespace.get(name)
+        if name in namespace and not callable(value) and not inspect.ismodule(value):
+            constants[name] = repr(value)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            constants.update(used_constants(const, namespace))
+    return constants
+
+
+def code_digest(dependency):
+    if isinstance(dependency, str):
+        return inspect.getsource(importlib.import_module(dependency))
+    constants = used_constants(dependency.__code__, dependency.__globals__)
+    return inspect.getsource(dependency) + json.dumps(constants, sort_keys=True)
+
+
+def node_digest(output):
+    # Empreinte des entrées et du code du nœud : un changement de l'un ou de l'autre le rend obsolète
+    node = NODES[output]
+    digest = hashlib.sha256()
+    for dependency in (node.build, *node.depends):
+        digest.update(code_digest(dependency).encode('utf-8'))
+    for path in node.inputs:
+        digest.update(file_digest(path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    with open(MANIFEST_FILE, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_manifest(manifest):
+    tmp_file = MANIFEST_FILE + '.tmp'
+    with open(tmp_file, mode='w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(tmp_file, MANIFEST_FILE)
+
+
+def required_nodes(targets):
+    # Les cibles demandées et tous les nœuds dont elles dépendent
+    needed = set()
+    pending = list(targets)
+    while pending:
+        output = pending.pop()
+        if output in NODES and output not in needed:
+            needed.add(output)
+            pending.extend(NODES[output].inputs)
+    return needed
+
+
+def build(targets=None, force=False, jobs=None):
+    needed = required_nodes(targets or NODES)
+    manifest = load_manifest()
+    built, skipped = [], []
+    done = set()
+    running = {}
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        while len(done) < len(needed):
+            # Lancer chaque nœud dont toutes les entrées dérivées sont à jour
+            for output in sorted(needed - done - {output for output, _ in running.values()}):
+                if any(path in needed and path not in done for path in NODES[output].inputs):
+                    continue
+                digest = node_digest(output)
+                if not force and manifest.get(output) == digest and os.path.exists(output):
+                    done.add(output)
+                    skipped.append(output)
+                    continue
+                running[executor.submit(NODES[output].build, NODES[output].inputs, output)] = (output, digest)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                output, digest = running.pop(future)
+                future.result()
+                manifest[output] = digest
+                save_manifest(manifest)
+                done.add(output)
+                built.append(output)
+
+    return built, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construit les tables dérivées obsolètes.")
+    parser.add_argument('targets', nargs='*', help="fichiers à construire (tous par défaut)")
+    parser.add_argument('--force', action='store_true', help="reconstruire même les nœuds à jour")
+    parser.add_argument('--jobs', type=int, default=None, help="nombre de processus (par défaut : nombre de cœurs)")
+    args = parser.parse_args()
+
+    built, skipped = build(args.targets, force=args.force, jobs=args.jobs)
+    print(f"{len(built)} table(s) reconstruite(s) : {', '.join(built) or '-'}")
+    print(f"{len(skipped)} table(s) à jour : {', '.join(skipped) or '-'}")
@@ -0,0 +1,208 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+from google.api_core import exceptions
+
+# Écriture en masse dans Firestore (rechargement de données dérivées, par exemple les sessions
+# calculées réécrites dans la collection Analyse) : les documents sont regroupés en lots
+# (WriteBatch, 500 écritures au plus) validés en parallèle avec un nombre limité de lots en vol,
+# réessayés avec un délai exponentiel en cas d'erreur transitoire. Les lots validés sont notés
+# dans un fichier de reprise : une exécution interrompue reprend là où elle s'est arrêtée.
+# Les identifiants des documents sont tirés de colonnes de la source, donc une réécriture est
+# idempotente.
+#
+# Pour tester contre l'émulateur : firebase emulators:start --only firestore, puis
+#   FIRESTORE_EMULATOR_HOST=localhost:8080 python bulk_write.py validated/sessions.parquet Analyse/sessions/items --id uid date session_id
+
+CREDENTIALS_FILE = "C:/Users/nguek/dhoolaTestFront/myDhoola/myDhoola.json"
+EMULATOR_PROJECT = 'demo-dhoola'
+CHECKPOINT_DIR = '.bulk_write'
+
+# Limite de Firestore pour un lot d'écritures
+MAX_BATCH_SIZE = 500
+CONCURRENCY = 8
+MAX_RETRIES = 5
+BASE_DELAY = 0.5  # secondes
+MAX_DELAY = 30
+
+# Erreurs transitoires : le lot est réessayé (les écritures d'un lot sont atomiques et set() est idempotent)
+RETRYABLE_ERRORS = (
+    exceptions.Aborted,
+    exceptions.DeadlineExceeded,
+    exceptions.InternalServerError,
+    exceptions.ResourceExhausted,
+    exceptions.ServiceUnavailable,
+)
+
+
+def firestore_client():
+    # Avec FIRESTORE_EMULATOR_HOST, le client se connecte à l'émulateur sans identifiants
+    if os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        from google.cloud import firestore
+        return firestore.Client(project=os.environ.get('GCLOUD_PROJECT', EMULATOR_PROJECT))
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        firebase_admin.initialize_app(credentials.Certificate(os.environ.get('GOOGLE_APPLICATION_CREDENTIALS', CREDENTIALS_FILE)))
+    return firestore.client()
+
+
+def to_value(value):
+    # Types numpy / pandas -> types acceptés par Firestore
+    if isinstance(value, np.ndarray):
+        return [to_value(item) for item in value]
+    if isinstance(value, (list, tuple)):
+        return [to_value(item) for item in value]
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def load_documents(source, id_columns):
+    # Documents (identifiant, données) dans l'ordre de la source, qui fixe le découpage en lots
+    df = pd.read_parquet(source) if source.endswith('.parquet') else pd.read_csv(source)
+    ids = df[list(id_columns)].astype(str).agg('_'.join, axis=1).str.replace('/', '_')
+    columns = list(df.columns)
+    for doc_id, values in zip(ids, df.itertuples(index=False, name=None)):
+        yield doc_id, {column: to_value(value) for column, value in zip(columns, values)}
+
+
+def chunks(documents, size):
+    chunk = []
+    for document in documents:
+        chunk.append(document)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_fingerprint(source, collection_path, id_columns, batch_size):
+    # Une reprise n'a de sens que pour la même source découpée de la même façon
+    digest = hashlib.sha256(json.dumps([collection_path, list(id_columns), batch_size]).encode('utf-8'))
+    with open(source, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def checkpoint_file(collection_path):
+    return os.path.join(CHECKPOINT_DIR, collection_path.replace('/', '__') + '.json')
+
+
+def load_checkpoint(path, fingerprint):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as file:
+        checkpoint = json.load(file)
+    if checkpoint.get('fingerprint') != fingerprint:
+        return set()
+    return set(checkpoint['completed'])
+
+
+def save_checkpoint(path, fingerprint, completed):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_file = path + '.tmp'
+    with open(tmp_file, mode='w', encoding='utf-8') as file:
+        json.dump({'fingerprint': fingerprint, 'completed': sorted(completed)}, file)
+    os.replace(tmp_file, path)
+
+
+def commit_chunk(db, collection_path, chunk, merge=False, retries=MAX_RETRIES, base_delay=BASE_DELAY):
+    collection = db.collection(collection_path)
+    for attempt in range(retries + 1):
+        batch = db.batch()
+        for doc_id, data in chunk:
+            batch.set(collection.document(doc_id), data, merge=merge)
+        try:
+            batch.commit()
+            return len(chunk)
+        except RETRYABLE_ERRORS:
+            if attempt == retries:
+                raise
+            # Délai exponentiel avec gigue, pour ne pas relancer tous les lots en même temps
+            time.sleep(min(MAX_DELAY, base_delay * 2 ** attempt) * random.uniform(0.5, 1))
+
+
+def collect(running, completed, checkpoint, fingerprint, errors):
+    # Attendre la fin d'au moins un lot, puis noter les lots validés dans le fichier de reprise
+    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+    written = 0
+    for future in finished:
+        index = running.pop(future)
+        if future.exception() is not None:
+            errors.append(future.exception())
+            continue
+        written += future.result()
+        completed.add(index)
+    save_checkpoint(checkpoint, fingerprint, completed)
+    return written
+
+
+def bulk_write(db, documents, collection_path, checkpoint, fingerprint, batch_size=MAX_BATCH_SIZE,
+               concurrency=CONCURRENCY, merge=False, retries=MAX_RETRIES):
+    completed = load_checkpoint(checkpoint, fingerprint)
+    written, skipped = 0, 0
+    running = {}
+    errors = []
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for index, chunk in enumerate(chunks(documents, batch_size)):
+            if index in completed:
+                skipped += len(chunk)
+                continue
+            # Au plus `concurrency` lots en vol : on attend qu'un lot se termine avant d'en lancer un autre
+            while len(running) >= concurrency:
+                written += collect(running, completed, checkpoint, fingerprint, errors)
+            # Après une erreur définitive, plus aucun lot n'est lancé ; ceux en vol sont attendus
+            # et notés, pour que la reprise ne réécrive que le nécessaire
+            if errors:
+                break
+            running[executor.submit(commit_chunk, db, collection_path, chunk, merge, retries)] = index
+        while running:
+            written += collect(running, completed, checkpoint, fingerprint, errors)
+
+    if errors:
+        raise errors[0]
+    return written, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Écrit en masse les lignes d'un fichier CSV ou parquet dans une collection Firestore.")
+    parser.add_argument('source', help="fichier CSV ou parquet, une ligne par document")
+    parser.add_argument('collection', help="chemin de la collection (par exemple Analyse/sessions/items)")
+    parser.add_argument('--id', nargs='+', required=True, dest='id_columns', help="colonnes formant l'identifiant des documents")
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE, help=f"écritures par lot (au plus {MAX_BATCH_SIZE})")
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help="nombre maximal de lots en vol")
+    parser.add_argument('--retries', type=int, default=MAX_RETRIES, help="nouvelles tentatives par lot en cas d'erreur transitoire")
+    parser.add_argument('--merge', action='store_true', help="fusionner avec les documents existants au lieu de les remplacer")
+    parser.add_argument('--checkpoint', default=None, help="fichier de reprise (par défaut dans .bulk_write/)")
+    parser.add_argument('--restart', action='store_true', help="ignorer le fichier de reprise et tout réécrire")
+    args = parser.parse_args()
+    if not 0 < args.batch_size <= MAX_BATCH_SIZE:
+        parser.error(f"--batch-size doit être compris entre 1 et {MAX_BATCH_SIZE}")
+
+    checkpoint = args.checkpoint or checkpoint_file(args.collection)
+    if args.restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    fingerprint = write_fingerprint(args.source, args.collection, args.id_columns, args.batch_size)
+    written, skipped = bulk_write(firestore_client(), load_documents(args.source, args.id_columns), args.collection,
+                                  checkpoint, fingerprint, batch_size=args.batch_size, concurrency=args.concurrency,
+                                  merge=args.merge, retries=args.retries)
+    print(f"{written} document(s) écrit(s) dans {args.collection}, {skipped} déjà écrit(s) lors d'une exécution précédente")
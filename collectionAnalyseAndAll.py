@@ -3,6 +3,10 @@ import os
 import firebase_admin
 from firebase_admin import credentials, firestore
 
+from build_graph import build
+from forecast import refresh_forecasts
+from validation import REPORT_FILE, run_validation
+
 # Initialiser Firebase
 cred = credentials.Certificate("C:/Users/nguek/dhoolaTestFront/myDhoola/myDhoola.json")
 firebase_admin.initialize_app(cred)
@@ -64,3 +68,16 @@ if __name__ == "__main__":
     write_data_to_csv(firebase_data_all_collections)
     
     print("Données extraites et enregistrées dans des fichiers CSV avec succès !")
+
+    # Reconstruire uniquement les tables dérivées dont les exports ont changé
+    built, _ = build()
+    print(f"Tables dérivées reconstruites : {', '.join(built) or 'aucune'}")
+
+    # Réajuster les modèles de prévision des seuls segments ayant de nouvelles données
+    refitted = refresh_forecasts()
+    print(f"Modèles de prévision réajustés : {len(refitted)} segment(s)")
+
+    # Valider les exports (types, quarantaine, rapport qualité) pour les tableaux de bord
+    quality_report = run_validation()
+    quarantined = sum(report['quarantined'] for report in quality_report['collections'].values())
+    print(f"Validation terminée : {quarantined} lignes en quarantaine, rapport dans {REPORT_FILE}")
@@ -0,0 +1,190 @@
+import os
+import threading
+from typing import NamedTuple
+
+import pandas as pd
+import streamlit as st
+
+from approx import build_sample
+from forecast import FORECASTS_FILE, ROLLUP_FILE, fill_history, load_histories
+from shared_store import current_version, open_dataset
+from user_index import TABLES, build_user_index
+from validation import VALIDATED_DIR, validate_all
+
+
+# Filtres de la barre latérale, sous forme hashable pour servir de clé de cache
+class Filtres(NamedTuple):
+    countries: tuple = ()
+    devices: tuple = ()
+    dates: tuple = ()
+
+
+def date_bounds(dates):
+    # Une plage n'est appliquée que lorsque les deux dates sont sélectionnées
+    if len(dates) == 2:
+        return pd.Timestamp(dates[0]), pd.Timestamp(dates[1])
+    return None
+
+
+DATASETS = ('users', 'sessions', 'buttonPressedTime', 'transaction', 'prestataires', 'appOpenedTime', 'pageOpenedTime', 'notifications')
+
+
+# Chargement des données validées et typées (cf. validation.py) : une seule lecture par
+# processus, partagée entre sessions
+@st.cache_data
+def validate_exports():
+    # Exports pas encore validés : la validation est faite en mémoire, une seule fois
+    return {name: valid for name, (valid, _, _) in validate_all().items()}
+
+
+@st.cache_data
+def load_validated(name):
+    path = os.path.join(VALIDATED_DIR, f"{name}.parquet")
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+    return validate_exports()[name]
+
+
+# Version du magasin partagé (cf. shared_store.py) utilisée par ce processus
+active_version = None
+version_lock = threading.Lock()
+
+
+def sync_dataset_version():
+    # Appelé à chaque exécution de l'application : si une nouvelle version a été publiée, les
+    # caches calculés sur l'ancienne sont vidés et la nouvelle est mappée à la demande
+    global active_version
+    version = current_version()
+    with version_lock:
+        if version != active_version:
+            if active_version is not None:
+                st.cache_data.clear()
+                map_dataset.clear()
+                load_user_index.clear()
+                load_samples.clear()
+                # Relancer le préchargement (données, index, échantillons) pour la nouvelle version
+                prewarm.clear()
+            active_version = version
+    return version
+
+
+# Jeu de données mappé en lecture seule : partagé sans copie entre les sessions du processus
+# (st.cache_data renverrait une copie à chaque appel) et, via le fichier, entre les processus
+@st.cache_resource(show_spinner=False)
+def map_dataset(name, version):
+    return open_dataset(name, version)
+
+
+def load_dataset(name):
+    version = active_version if active_version is not None else sync_dataset_version()
+    if version is not None:
+        df = map_dataset(name, version)
+        if df is not None:
+            return df
+    # Aucune version publiée : lecture des fichiers validés, propre à chaque processus
+    return load_validated(name)
+
+
+def load_users():
+    return load_dataset('users')
+
+
+def load_sessions():
+    return load_dataset('sessions')
+
+
+def load_button_pressed_time():
+    return load_dataset('buttonPressedTime')
+
+
+def load_transactions():
+    return load_dataset('transaction')
+
+
+def load_prestataires():
+    return load_dataset('prestataires')
+
+
+# Index par utilisateur, partagé tel quel (sans copie) entre toutes les sessions
+@st.cache_resource(show_spinner=False)
+def load_user_index():
+    names = {name for name, _, _ in TABLES.values()}
+    return build_user_index({name: load_dataset(name) for name in names})
+
+
+# Échantillons stratifiés du mode approximatif (cf. approx.py), tirés une fois par processus ;
+# seuls les utilisateurs connus y figurent, comme dans les calculs exacts filtrés par utilisateur
+@st.cache_resource(show_spinner=False)
+def load_samples():
+    segments = load_users()[['uid', 'country', 'device']]
+    return {
+        'sessions': build_sample(load_sessions().merge(segments, on='uid'), 'session_start'),
+        'buttonPressedTime': build_sample(load_button_pressed_time().merge(segments, on='uid'), 'time'),
+    }
+
+
+# Prévisions précalculées par forecast.py (aucun ajustement de modèle dans les pages). La date de
+# modification des fichiers fait partie de la clé de cache : un nouvel ajustement est relu sans
+# redémarrer le serveur, et l'absence de fichier n'est jamais mise en cache.
+def file_mtime(path):
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+
+@st.cache_data(max_entries=1)
+def read_forecasts(mtime):
+    return pd.read_csv(FORECASTS_FILE, parse_dates=['date'])
+
+
+@st.cache_data(max_entries=1)
+def read_forecast_histories(mtime):
+    return {segment: fill_history(history) for segment, history in load_histories(ROLLUP_FILE).items()}
+
+
+def load_forecasts():
+    mtime = file_mtime(FORECASTS_FILE)
+    return None if mtime is None else read_forecasts(mtime)
+
+
+def load_forecast_histories():
+    mtime = file_mtime(ROLLUP_FILE)
+    return {} if mtime is None else read_forecast_histories(mtime)
+
+
+def sidebar_filtres():
+    # Widgets interactifs pour le filtrage
+    users = load_users()
+    selected_country = st.sidebar.multiselect("Sélectionnez les pays", options=users['country'].unique(), key='country_selector')
+    selected_device_type = st.sidebar.multiselect("Sélectionnez le type d'appareil", options=['Android', 'IOS'], key='device_type_selector')
+    date_range = st.sidebar.date_input("Sélectionnez la plage de dates", [])
+    return Filtres(tuple(selected_country), tuple(selected_device_type), tuple(date_range))
+
+
+@st.cache_data
+def filter_users(countries, devices):
+    filtered_users = load_users()
+    if countries:
+        filtered_users = filtered_users[filtered_users['country'].isin(countries)]
+    if devices:
+        filtered_users = filtered_users[filtered_users['device'].isin(devices)]
+    return filtered_users
+
+
+def prewarm_datasets():
+    for name in DATASETS:
+        load_dataset(name)
+    # Filtre par défaut utilisé à l'ouverture de chaque page
+    filter_users((), ())
+    load_user_index()
+    # Échantillons du mode approximatif, tirés ici plutôt qu'au premier usage du mode
+    load_samples()
+
+
+@st.cache_resource(show_spinner=False)
+def prewarm():
+    # Chargement en arrière-plan, une seule fois par processus serveur (et après chaque changement
+    # de version), lancé par app.py après le rendu de la première page : les pages visitées ensuite
+    # trouvent données, index et échantillons déjà prêts. Streamlit n'offre pas de point d'entrée au
+    # démarrage du serveur : la première page elle-même n'en profite pas (cf. bench_startup.py).
+    thread = threading.Thread(target=prewarm_datasets, name='prewarm', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,126 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# Prévisions des utilisateurs actifs quotidiens et des transactions par segment (pays, appareil)
+# à partir de l'agrégat quotidien du graphe de construction. Un modèle Prophet est ajusté par
+# segment et par métrique, en parallèle sur plusieurs processus, puis sauvegardé : il n'est
+# réajusté que si les données de son segment ont changé. La page Engagement se contente de lire
+# les prévisions enregistrées. prophet n'est importé que dans les processus d'ajustement.
+
+ROLLUP_FILE = 'daily_segment_rollup.csv'
+MODELS_DIR = os.path.join('models', 'forecast')
+MANIFEST_FILE = os.path.join(MODELS_DIR, 'manifest.json')
+FORECASTS_FILE = os.path.join(MODELS_DIR, 'forecasts.csv')
+
+METRICS = ('active_users', 'transactions')
+ALL_SEGMENTS = 'Tous'
+HORIZON_DAYS = 30
+# En dessous de ce nombre de jours d'historique, le segment n'est pas modélisé
+MIN_HISTORY_DAYS = 14
+
+
+def load_histories(rollup_file=ROLLUP_FILE):
+    # Lignes de l'agrégat propres à chaque segment (jours actifs seulement), plus le total
+    rollup = pd.read_csv(rollup_file, parse_dates=['date'])
+    total = rollup.groupby('date')[list(METRICS)].sum().reset_index().assign(country=ALL_SEGMENTS, device=ALL_SEGMENTS)
+    rollup = pd.concat([rollup, total], ignore_index=True)
+
+    histories = {}
+    for (country, device), segment in rollup.groupby(['country', 'device']):
+        history = segment.sort_values('date')[['date', *METRICS]].reset_index(drop=True)
+        if (history[list(METRICS)].sum(axis=1) > 0).sum() >= MIN_HISTORY_DAYS:
+            histories[(country, device)] = history
+    return histories
+
+
+def fill_history(history):
+    # Série quotidienne complète sur la période du segment (jours sans activité à 0), construite
+    # seulement au moment de l'ajustement : elle ne dépend que des lignes du segment
+    days = pd.date_range(history['date'].min(), history['date'].max(), freq='D', name='date')
+    return history.set_index('date').reindex(days, fill_value=0).reset_index()
+
+
+def segment_fingerprint(history):
+    # Empreinte des seules lignes du segment : une nouvelle journée dans un autre segment ne la change pas
+    return hashlib.sha256(pd.util.hash_pandas_object(history, index=False).values.tobytes()).hexdigest()
+
+
+def model_file(country, device, metric):
+    return os.path.join(MODELS_DIR, f"{country}__{device}__{metric}.json".replace(' ', '_'))
+
+
+def fit_segment(country, device, metric, history, horizon=HORIZON_DAYS):
+    from cmdstanpy.utils import get_logger
+    from prophet import Prophet
+    from prophet.serialize import model_to_json
+
+    # cmdstanpy installe son gestionnaire (et remet le niveau à DEBUG) au premier appel de
+    # get_logger : l'appeler d'abord, puis relever le niveau, masque les messages INFO de chaque chaîne
+    get_logger().setLevel(logging.WARNING)
+
+    history = fill_history(history)
+    model = Prophet(weekly_seasonality=True, daily_seasonality=False, yearly_seasonality=False)
+    model.fit(history.rename(columns={'date': 'ds', metric: 'y'})[['ds', 'y']])
+    future = model.make_future_dataframe(periods=horizon, include_history=False)
+    prediction = model.predict(future)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+
+    # Des comptes ne peuvent pas être négatifs
+    prediction[['yhat', 'yhat_lower', 'yhat_upper']] = prediction[['yhat', 'yhat_lower', 'yhat_upper']].clip(lower=0)
+    with open(model_file(country, device, metric), mode='w', encoding='utf-8') as file:
+        file.write(model_to_json(model))
+    return prediction.rename(columns={'ds': 'date'}).assign(country=country, device=device, metric=metric)
+
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    with open(MANIFEST_FILE, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def refresh_forecasts(force=False, jobs=None):
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    histories = load_histories()
+    manifest = load_manifest()
+    previous = pd.read_csv(FORECASTS_FILE, parse_dates=['date']) if os.path.exists(FORECASTS_FILE) else None
+
+    # Segments dont les données ont changé depuis le dernier ajustement
+    stale = [(country, device) for (country, device), history in histories.items()
+             if force or manifest.get(f"{country}/{device}") != segment_fingerprint(history)]
+
+    forecasts = []
+    if stale:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(fit_segment, country, device, metric, histories[(country, device)])
+                       for country, device in stale for metric in METRICS]
+            forecasts = [future.result() for future in futures]
+
+    # Conserver les prévisions des segments inchangés
+    if previous is not None:
+        unchanged = [segment for segment in histories if segment not in stale]
+        forecasts.append(previous[previous.set_index(['country', 'device']).index.isin(unchanged)])
+    if forecasts:
+        pd.concat(forecasts, ignore_index=True).to_csv(FORECASTS_FILE, index=False)
+
+    manifest = {f"{country}/{device}": segment_fingerprint(history) for (country, device), history in histories.items()}
+    tmp_file = MANIFEST_FILE + '.tmp'
+    with open(tmp_file, mode='w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(tmp_file, MANIFEST_FILE)
+    return stale
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ajuste les modèles de prévision des segments dont les données ont changé.")
+    parser.add_argument('--force', action='store_true', help="réajuster tous les segments")
+    parser.add_argument('--jobs', type=int, default=None, help="nombre de processus (par défaut : nombre de cœurs)")
+    args = parser.parse_args()
+
+    refitted = refresh_forecasts(force=args.force, jobs=args.jobs)
+    print(f"{len(refitted)} segment(s) réajusté(s) : {', '.join('/'.join(segment) for segment in refitted) or '-'}")
@@ -0,0 +1,33 @@
+# Génération du rapport PDF. fpdf, kaleido et plotly.io sont lourds à importer : ils ne sont
+# chargés qu'au moment où un rapport est demandé, pas au chargement des pages.
+
+
+# Fonction pour créer un PDF
+def create_pdf(report, graphs, filename="rapport.pdf"):
+    import os
+    import tempfile
+
+    import plotly.io as pio
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+
+    # Ajouter le rapport texte
+    for line in report.split('\n'):
+        if line.strip() == "":
+            pdf.ln(10)  # Add a new line for empty lines
+        else:
+            pdf.multi_cell(0, 10, txt=line)
+
+    # Ajouter les graphiques
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        for fig, file_name in graphs:
+            if fig is not None:  # Only process the figure if it is not None
+                img_path = os.path.join(tmpdirname, file_name)
+                pio.write_image(fig, img_path, engine="kaleido")
+                pdf.add_page()
+                pdf.image(img_path, x=10, y=10, w=190)
+
+    pdf.output(filename)
@@ -0,0 +1,91 @@
+import argparse
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+
+from validation import COLLECTIONS, VALIDATED_DIR
+
+# Magasin partagé entre les processus serveur : chaque version des données validées est publiée
+# sous forme de fichiers Arrow IPC non compressés, que chaque processus mappe en lecture seule.
+# Les colonnes numériques, dates et chaînes des DataFrame obtenus pointent directement dans le
+# fichier mappé : N processus partagent une seule copie physique (le cache de pages du système).
+# Une version est écrite dans un répertoire temporaire puis renommée ; le fichier CURRENT qui
+# désigne la version active est remplacé atomiquement (os.replace).
+
+STORE_DIR = os.path.join(VALIDATED_DIR, 'store')
+CURRENT_FILE = os.path.join(STORE_DIR, 'CURRENT')
+# Versions conservées : un processus qui vient de lire l'ancien CURRENT trouve encore ses fichiers
+KEEP_VERSIONS = 3
+
+
+def dataset_file(version, name):
+    return os.path.join(STORE_DIR, version, f"{name}.arrow")
+
+
+def write_table(df, path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def publish(datasets):
+    # datasets : nom du jeu de données -> DataFrame validé
+    version = pd.Timestamp.now().strftime('%Y%m%d-%H%M%S-%f')
+    staging = os.path.join(STORE_DIR, f".{version}.tmp")
+    os.makedirs(staging)
+    for name, df in datasets.items():
+        write_table(df, os.path.join(staging, f"{name}.arrow"))
+    os.rename(staging, os.path.join(STORE_DIR, version))
+
+    tmp_file = CURRENT_FILE + '.tmp'
+    with open(tmp_file, mode='w', encoding='utf-8') as file:
+        file.write(version)
+    os.replace(tmp_file, CURRENT_FILE)
+    prune_versions()
+    return version
+
+
+def prune_versions(keep=KEEP_VERSIONS):
+    versions = sorted(entry for entry in os.listdir(STORE_DIR)
+                      if not entry.startswith('.') and os.path.isdir(os.path.join(STORE_DIR, entry)))
+    for version in versions[:-keep]:
+        # Les processus qui mappent encore ces fichiers gardent leur copie jusqu'à la fermeture
+        # (sous Windows, un fichier mappé ne peut pas être supprimé : il le sera au prochain passage)
+        shutil.rmtree(os.path.join(STORE_DIR, version), ignore_errors=True)
+
+
+def current_version():
+    try:
+        with open(CURRENT_FILE, encoding='utf-8') as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def open_dataset(name, version):
+    # DataFrame en lecture seule adossé au fichier mappé ; None si le jeu n'a pas été publié
+    path = dataset_file(version, name)
+    if not os.path.exists(path):
+        return None
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def publish_validated():
+    # Publier les fichiers déjà produits par validation.py
+    datasets = {}
+    for name in COLLECTIONS:
+        path = os.path.join(VALIDATED_DIR, f"{name}.parquet")
+        if os.path.exists(path):
+            datasets[name] = pd.read_parquet(path)
+    return publish(datasets)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publie les données validées dans le magasin partagé entre les processus serveur.")
+    parser.parse_args()
+
+    version = publish_validated()
+    print(f"Version {version} publiée dans {STORE_DIR}")
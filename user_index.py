@@ -0,0 +1,112 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Index par utilisateur : chaque table est triée par (uid, temps) et accompagnée du tableau trié
+# des uid distincts et de leurs offsets. Les lignes d'un utilisateur sont alors la tranche
+# rows[offsets[i]:offsets[i + 1]], trouvée par recherche dichotomique en O(log n). Une clé
+# composite (position de l'uid, temps), triée comme les lignes, permet de borner dans le temps
+# les tranches de tous les uid demandés avec une seule recherche dichotomique vectorisée.
+
+# Tables indexées : libellé -> (jeu de données, colonne uid, colonne de temps)
+TABLES = {
+    'Ouvertures de l\'application': ('appOpenedTime', 'uid', 'time'),
+    'Pages ouvertes': ('pageOpenedTime', 'uid', 'time'),
+    'Boutons cliqués': ('buttonPressedTime', 'uid', 'time'),
+    'Sessions': ('sessions', 'uid', 'session_start'),
+    'Transactions (payeur)': ('transaction', 'payeurUid', 'creationTime'),
+    'Transactions (prestataire)': ('transaction', 'prestataireUid', 'creationTime'),
+    'Notifications': ('notifications', 'uid', 'createdAt'),
+}
+
+# Tables dont chaque ligne couvre un intervalle : colonne de fin. Les sessions d'un utilisateur ne
+# se chevauchent pas, donc leurs fins sont triées comme leurs débuts et la clé de fin l'est aussi.
+END_COLUMNS = {
+    'Sessions': 'session_end',
+}
+
+KEY_DTYPE = np.dtype([('uid', 'i8'), ('time', 'i8')])
+
+
+def time_values(values):
+    # Temps en nanosecondes (int64) ; NaT devient le plus petit entier et se trie en premier
+    return np.asarray(values, dtype='datetime64[ns]').view('int64')
+
+
+def composite_key(positions, times):
+    key = np.empty(len(positions), dtype=KEY_DTYPE)
+    key['uid'] = positions
+    key['time'] = times
+    return key
+
+
+class UserIndex(NamedTuple):
+    uids: np.ndarray
+    offsets: np.ndarray
+    rows: pd.DataFrame
+    time_column: str
+    keys: np.ndarray
+    end_keys: np.ndarray = None
+
+    def position(self, uid):
+        i = np.searchsorted(self.uids, uid)
+        if i < len(self.uids) and self.uids[i] == uid:
+            return i
+        return None
+
+    def lookup(self, uid):
+        i = self.position(uid)
+        if i is None:
+            return self.rows.iloc[0:0]
+        return self.rows.iloc[self.offsets[i]:self.offsets[i + 1]]
+
+    def counts(self, uids, start=None, end=None):
+        # Nombre de lignes de chaque uid (0 si inconnu), éventuellement limité aux lignes qui
+        # commencent après start et se terminent avant end (fin = temps si la table n'a pas de
+        # colonne de fin) ; une recherche dichotomique vectorisée par borne, sans boucle sur les uid
+        uids = np.asarray(uids, dtype=str)
+        if not len(self.uids) or not len(uids):
+            return np.zeros(len(uids), dtype=int)
+        positions = np.minimum(np.searchsorted(self.uids, uids), len(self.uids) - 1)
+        found = self.uids[positions] == uids
+
+        low, high = self.offsets[positions], self.offsets[positions + 1]
+        if start is not None:
+            low = np.searchsorted(self.keys, composite_key(positions, np.full(len(uids), pd.Timestamp(start).value)), side='left')
+        if end is not None:
+            end_keys = self.keys if self.end_keys is None else self.end_keys
+            high = np.searchsorted(end_keys, composite_key(positions, np.full(len(uids), pd.Timestamp(end).value)), side='right')
+        return np.where(found, np.maximum(high - low, 0), 0)
+
+
+def build_index(df, uid_column, time_column, end_column=None):
+    rows = df[df[uid_column].notna()]
+    uid_values = rows[uid_column].to_numpy(dtype=str)
+    order = np.lexsort((time_values(rows[time_column]), uid_values))
+    rows = rows.iloc[order].reset_index(drop=True)
+    uids, starts, sizes = np.unique(uid_values[order], return_index=True, return_counts=True)
+    offsets = np.append(starts, len(rows))
+
+    positions = np.repeat(np.arange(len(uids)), sizes)
+    keys = composite_key(positions, time_values(rows[time_column]))
+    end_keys = composite_key(positions, time_values(rows[end_column])) if end_column else None
+    return UserIndex(uids, offsets, rows, time_column, keys, end_keys)
+
+
+def build_user_index(datasets):
+    # datasets : nom du jeu de données -> DataFrame
+    return {label: build_index(datasets[name], uid_column, time_column, END_COLUMNS.get(label))
+            for label, (name, uid_column, time_column) in TABLES.items() if name in datasets}
+
+
+def user_timeline(index, uid):
+    # Historique complet d'un utilisateur, tous types d'événements confondus, trié par date
+    events = []
+    for label, table_index in index.items():
+        rows = table_index.lookup(uid)
+        if len(rows):
+            events.append(pd.DataFrame({'time': rows[table_index.time_column].to_numpy(), 'event': label}))
+    if not events:
+        return pd.DataFrame(columns=['time', 'event'])
+    return pd.concat(events, ignore_index=True).sort_values('time', kind='stable').reset_index(drop=True)
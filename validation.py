@@ -0,0 +1,247 @@
+import ast
+import json
+import os
+
+import pandas as pd
+
+# Étape de validation du pipeline de gouvernance : exécutée une fois à l'export, elle type les
+# colonnes, met en quarantaine les lignes invalides (avec leurs motifs) et publie un rapport
+# qualité. Les tableaux de bord chargent ensuite des données déjà validées et typées.
+
+VALIDATED_DIR = 'validated'
+QUARANTINE_DIR = os.path.join(VALIDATED_DIR, 'quarantine')
+REPORT_FILE = os.path.join(VALIDATED_DIR, 'quality_report.json')
+
+# Toute date antérieure est considérée comme invalide
+EARLIEST_DATE = pd.Timestamp('2020-01-01')
+
+# Normalisation des noms de ville (cf. users_clean.ipynb)
+TOWN_MAPPING = {
+    'yaounde': 'yaoundé',
+    'douala, yaoundé et edea': 'yaoundé',
+    'mélong, moungo-littoral': 'mélong',
+}
+
+# Règles par collection, dans l'ordre de validation (les collections référencées d'abord) :
+# - columns : type attendu de chaque colonne ('string', 'boolean', 'float', 'datetime',
+#   'timestamp_ms' pour les epochs en millisecondes, 'list' pour les listes sérialisées)
+# - required : colonnes obligatoires ; unique : clé d'unicité
+# - ranges : bornes (min, max) des colonnes numériques
+# - ordered : paires de colonnes dont la première doit précéder la seconde
+# - references : uid devant exister dans l'une des collections citées (ligne mise en quarantaine)
+# - soft_references : idem, mais seulement signalé dans le rapport (utilisateurs de test ou supprimés)
+COLLECTIONS = {
+    'users': {
+        'file': 'users.csv',
+        'columns': {'uid': 'string', 'country': 'string', 'isAndroid': 'boolean', 'creationTime': 'datetime',
+                    'first_name': 'string', 'last_name': 'string', 'town': 'string', 'gender': 'string', 'typeUser': 'string'},
+        'required': ['uid', 'country', 'creationTime'],
+        'unique': ['uid'],
+    },
+    'prestataires': {
+        'file': 'prestataires.csv',
+        'columns': {'uid': 'string', 'companyName': 'string', 'country': 'string', 'creationTime': 'datetime'},
+        'required': ['uid'],
+        'unique': ['uid'],
+    },
+    'transaction': {
+        'file': 'transaction.csv',
+        'columns': {'order_reference': 'string', 'payeurUid': 'string', 'prestataireUid': 'string',
+                    'creationTime': 'timestamp_ms', 'montantTotal': 'float', 'montantPaye': 'float', 'statusTransaction': 'string'},
+        'required': ['order_reference', 'prestataireUid', 'creationTime'],
+        'unique': ['order_reference'],
+        'ranges': {'montantTotal': (0, None), 'montantPaye': (0, None)},
+        'references': {'prestataireUid': ['prestataires']},
+        'soft_references': {'payeurUid': ['users', 'prestataires']},
+    },
+    'sessions': {
+        'file': 'sessions_with_pages_true.csv',
+        'columns': {'uid': 'string', 'date': 'datetime', 'session_id': 'float', 'session_start': 'datetime', 'session_end': 'datetime',
+                    'session_duration_in_seconds': 'float', 'visited_pages': 'list'},
+        'required': ['uid', 'date', 'session_start', 'session_end', 'visited_pages'],
+        # Les sessions sont découpées par jour (cf. build_graph.build_session_times) : une session
+        # qui passe minuit donne deux lignes de même session_id, à des dates différentes
+        'unique': ['uid', 'date', 'session_id'],
+        'ranges': {'session_duration_in_seconds': (0, None)},
+        'ordered': [('session_start', 'session_end')],
+        'soft_references': {'uid': ['users', 'prestataires']},
+    },
+    'appOpenedTime': {
+        'file': 'appOpenedTime.csv',
+        'columns': {'time': 'timestamp_ms', 'uid': 'string', 'isOpend': 'boolean'},
+        'required': ['time', 'uid'],
+        'soft_references': {'uid': ['users', 'prestataires']},
+    },
+    'pageOpenedTime': {
+        'file': 'pageOpenedTime.csv',
+        'columns': {'time': 'timestamp_ms', 'page': 'string', 'uid': 'string', 'isIn': 'boolean'},
+        'required': ['time', 'page', 'uid'],
+        'soft_references': {'uid': ['users', 'prestataires']},
+    },
+    'buttonPressedTime': {
+        'file': 'buttonPressedTime.csv',
+        'columns': {'time': 'timestamp_ms', 'page': 'string', 'uid': 'string', 'button': 'string'},
+        'required': ['time', 'uid', 'button'],
+        'soft_references': {'uid': ['users', 'prestataires']},
+    },
+    'notifications': {
+        'file': 'notifications.csv',
+        'columns': {'uid': 'string', 'idPrestataire': 'string', 'isRead': 'boolean',
+                    'createdAt': 'timestamp_ms', 'updatedAt': 'timestamp_ms'},
+        'required': ['uid', 'createdAt'],
+        'soft_references': {'uid': ['users', 'prestataires']},
+    },
+}
+
+# Epochs en millisecondes représentables en datetime64[ns] ; au-delà, la valeur est un type invalide
+TIMESTAMP_MS_RANGE = (pd.Timestamp.min.value // 10**6 + 1, pd.Timestamp.max.value // 10**6)
+
+BOOLEAN_VALUES = {True: True, False: False, 'True': True, 'False': False, 'true': True, 'false': False}
+
+
+def parse_list(value):
+    try:
+        parsed = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return None
+    return parsed if isinstance(parsed, list) else None
+
+
+def cast_column(values, kind):
+    if kind == 'string':
+        return values.astype('string')
+    if kind == 'boolean':
+        return values.map(BOOLEAN_VALUES).astype('boolean')
+    if kind == 'float':
+        return pd.to_numeric(values, errors='coerce')
+    if kind == 'datetime':
+        # Dates avec ou sans fuseau ramenées en UTC naïf, comparables entre elles et aux bornes
+        return pd.to_datetime(values, errors='coerce', format='ISO8601', utc=True).dt.tz_convert(None)
+    if kind == 'timestamp_ms':
+        low, high = TIMESTAMP_MS_RANGE
+        epochs = pd.to_numeric(values, errors='coerce')
+        return pd.to_datetime(epochs.where(epochs.between(low, high)), unit='ms')
+    if kind == 'list':
+        return values.map(parse_list, na_action='ignore')
+    raise ValueError(f"Type de colonne inconnu : {kind}")
+
+
+def add_failures(reasons, failures, mask, rule):
+    # Ajoute le motif `rule` aux lignes de `mask` (opération vectorisée sur toute la colonne)
+    count = int(mask.sum())
+    if count:
+        reasons[mask] = reasons[mask] + rule + '; '
+        failures[rule] = count
+
+
+def reference_ids(targets, valid_ids):
+    ids = [valid_ids[target] for target in targets if target in valid_ids]
+    return pd.Index([]).append(ids) if ids else pd.Index([])
+
+
+def validate_collection(name, raw, valid_ids):
+    rules = COLLECTIONS[name]
+    reasons = pd.Series('', index=raw.index, dtype=object)
+    failures = {}
+    warnings = {}
+
+    # Schéma : les colonnes absentes sont ajoutées vides (et rejetées si obligatoires)
+    missing_columns = [column for column in rules['columns'] if column not in raw.columns]
+    original = raw.assign(**{column: pd.NA for column in missing_columns})
+
+    # Types
+    df = original.copy()
+    for column, kind in rules['columns'].items():
+        df[column] = cast_column(original[column], kind)
+        add_failures(reasons, failures, original[column].notna() & df[column].isna(), f"type invalide: {column}")
+
+    # Valeurs obligatoires
+    for column in rules.get('required', []):
+        add_failures(reasons, failures, original[column].isna(), f"valeur manquante: {column}")
+
+    # Plages de valeurs
+    for column, (low, high) in rules.get('ranges', {}).items():
+        if low is not None:
+            add_failures(reasons, failures, df[column] < low, f"hors plage: {column} < {low}")
+        if high is not None:
+            add_failures(reasons, failures, df[column] > high, f"hors plage: {column} > {high}")
+    now = pd.Timestamp.now()
+    for column, kind in rules['columns'].items():
+        if kind in ('datetime', 'timestamp_ms'):
+            add_failures(reasons, failures, (df[column] < EARLIEST_DATE) | (df[column] > now), f"date invalide: {column}")
+    for first, second in rules.get('ordered', []):
+        add_failures(reasons, failures, df[first] > df[second], f"ordre invalide: {first} > {second}")
+
+    # Unicité
+    if rules.get('unique'):
+        add_failures(reasons, failures, df.duplicated(subset=rules['unique'], keep='first'), f"doublon: {', '.join(rules['unique'])}")
+
+    # Intégrité référentielle des uid
+    for column, targets in rules.get('references', {}).items():
+        add_failures(reasons, failures, df[column].notna() & ~df[column].isin(reference_ids(targets, valid_ids)), f"référence inconnue: {column}")
+    for column, targets in rules.get('soft_references', {}).items():
+        orphans = int((df[column].notna() & ~df[column].isin(reference_ids(targets, valid_ids))).sum())
+        if orphans:
+            warnings[f"référence inconnue: {column}"] = orphans
+
+    rejected = reasons != ''
+    valid = df[~rejected].reset_index(drop=True)
+    quarantine = raw[rejected].assign(quarantine_reasons=reasons[rejected].str.rstrip('; '))
+
+    # Colonnes dérivées, calculées une fois pour toutes
+    if name == 'users':
+        town = valid['town'].fillna('').str.strip().str.lower().replace(TOWN_MAPPING).str.title()
+        device = valid['isAndroid'].map({True: 'Android', False: 'IOS'}).fillna('Inconnu')
+        valid = valid.assign(town=town, device=device)
+
+    report = {
+        'rows': len(df),
+        'missing_columns': missing_columns,
+        'valid': len(valid),
+        'quarantined': int(rejected.sum()),
+        'failures': failures,
+        'warnings': warnings,
+    }
+    return valid, quarantine, report
+
+
+def validate_all(collections=None):
+    results = {}
+    valid_ids = {}
+    for name, rules in COLLECTIONS.items():
+        if collections is not None and name not in collections:
+            continue
+        if not os.path.exists(rules['file']):
+            continue
+        raw = pd.read_csv(rules['file'], encoding='utf-8-sig')
+        valid, quarantine, report = validate_collection(name, raw, valid_ids)
+        if 'uid' in valid.columns:
+            valid_ids[name] = pd.Index(valid['uid'].dropna())
+        results[name] = (valid, quarantine, report)
+    return results
+
+
+def run_validation():
+    os.makedirs(QUARANTINE_DIR, exist_ok=True)
+    results = validate_all()
+    quality_report = {'generated_at': pd.Timestamp.now().isoformat(), 'collections': {}}
+    for name, (valid, quarantine, report) in results.items():
+        valid.to_parquet(os.path.join(VALIDATED_DIR, f"{name}.parquet"), index=False)
+        quarantine.to_csv(os.path.join(QUARANTINE_DIR, f"{name}.csv"), index=False, encoding='utf-8-sig')
+        quality_report['collections'][name] = report
+
+    # Nouvelle version du magasin partagé, que les processus serveur mappent à leur prochaine exécution
+    from shared_store import publish
+    quality_report['store_version'] = publish({name: valid for name, (valid, _, _) in results.items()})
+
+    with open(REPORT_FILE, mode='w', encoding='utf-8') as file:
+        json.dump(quality_report, file, ensure_ascii=False, indent=2)
+    return quality_report
+
+
+if __name__ == "__main__":
+    quality_report = run_validation()
+    for name, report in quality_report['collections'].items():
+        print(f"{name}: {report['valid']}/{report['rows']} lignes valides, {report['quarantined']} en quarantaine")
+        for rule, count in {**report['failures'], **report['warnings']}.items():
+            print(f"    {rule}: {count}")